@@ -0,0 +1,555 @@
+"""
+benchmark.py - Benchmarks for the Voice Robot pipeline
+Results are printed (or written) as JSON
+
+Usage:
+    python benchmark.py stt --audio-dir samples/ --backends torch,int8,onnx
+    python benchmark.py audio
+    python benchmark.py intent
+    python benchmark.py pipeline --concurrency 1 4 16 --serial-latency-ms 5
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import re
+import resource
+import struct
+import sys
+import threading
+import time
+import tty
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (Linux reports KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "count": int(ms.size),
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^\w\s]", " ", text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> int:
+    """Word-level edit distance"""
+    ref, hyp = _words(reference), _words(hypothesis)
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1]
+
+
+def word_accuracy(references: List[str], hypotheses: List[str]) -> Optional[float]:
+    """1 - WER over all clips"""
+    total = sum(len(_words(r)) for r in references)
+    if not total:
+        return None
+    errors = sum(word_errors(r, h) for r, h in zip(references, hypotheses))
+    return round(max(0.0, 1.0 - errors / total), 4)
+
+
+def emit(result: dict, output: Optional[str]):
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+# ============================================================
+# STT BACKEND COMPARISON
+# ============================================================
+
+def _run_stt_backend(backend: str, paths: List[str], repeats: int, threads: int) -> dict:
+    """Runs in a fresh process so load time and RSS are per backend"""
+    import web_interface
+
+    web_interface.Config.TORCH_THREADS = threads
+    clips = []
+    for path in paths:
+        with open(path, "rb") as f:
+            clips.append(f.read())
+
+    start = time.perf_counter()
+    stt = web_interface.SpeechToText(backend=backend)
+    load_seconds = time.perf_counter() - start
+
+    # First call allocates buffers; keep it out of the numbers
+    stt.process_audio(clips[0])
+
+    texts = []
+    latencies = []
+    for clip in clips:
+        for i in range(repeats):
+            start = time.perf_counter()
+            text = stt.process_audio(clip)
+            latencies.append(time.perf_counter() - start)
+        texts.append(text)
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "latency_ms": latency_summary(latencies),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "texts": texts,
+    }
+
+
+def bench_stt(args) -> dict:
+    """Compare Whisper backends on a directory of WAV clips"""
+    paths = sorted(glob.glob(os.path.join(args.audio_dir, "*.wav")))
+    if not paths:
+        raise SystemExit(f"No .wav files in {args.audio_dir}")
+
+    # Optional reference transcripts: clip.wav -> clip.txt
+    references = []
+    for path in paths:
+        txt = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(txt):
+            with open(txt, encoding="utf-8") as f:
+                references.append(f.read().strip())
+        else:
+            references.append(None)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # fp32 baseline
+
+    ctx = multiprocessing.get_context("spawn")
+    runs = {}
+    for backend in backends:
+        with ctx.Pool(1) as pool:
+            try:
+                runs[backend] = pool.apply(_run_stt_backend, (backend, paths, args.repeats, args.threads))
+            except Exception as e:
+                runs[backend] = {"backend": backend, "error": str(e)}
+
+    # Clips without a transcript are scored against the fp32 output
+    baseline = runs["torch"].get("texts") or [""] * len(paths)
+    refs = [ref if ref is not None else base for ref, base in zip(references, baseline)]
+
+    for run in runs.values():
+        if "texts" in run:
+            run["word_accuracy"] = word_accuracy(refs, run["texts"])
+            run["agreement_with_fp32"] = word_accuracy(baseline, run["texts"])
+            if not args.keep_texts:
+                del run["texts"]
+
+    return {
+        "benchmark": "stt",
+        "clips": len(paths),
+        "repeats": args.repeats,
+        "threads": args.threads,
+        "references": sum(r is not None for r in references),
+        "backends": list(runs.values()),
+    }
+
+
+# ============================================================
+# AUDIO FRONT END MICROBENCHMARKS
+# ============================================================
+
+AUDIO_FORMATS = [
+    # (name, wav format tag, bits)
+    ("pcm_u8", 1, 8),
+    ("pcm_s16", 1, 16),
+    ("pcm_s24", 1, 24),
+    ("pcm_s32", 1, 32),
+    ("float32", 3, 32),
+    ("float64", 3, 64),
+]
+
+
+def make_wav(signal: np.ndarray, sr: int, tag: int, bits: int) -> bytes:
+    """Encode a float signal in [-1, 1] (frames x channels) as WAV"""
+    if tag == 3:
+        data = signal.astype("<f4" if bits == 32 else "<f8").tobytes()
+    elif bits == 8:
+        data = (signal * 127 + 128).astype(np.uint8).tobytes()
+    elif bits == 24:
+        ints = (signal * (2**23 - 1)).astype("<i4").reshape(-1, 1).view(np.uint8)
+        data = ints[:, :3].tobytes()
+    else:
+        dtype = "<i2" if bits == 16 else "<i4"
+        data = (signal * (2 ** (bits - 1) - 1)).astype(dtype).tobytes()
+
+    channels = signal.shape[1]
+    block = channels * bits // 8
+    fmt = struct.pack("<HHIIHH", tag, channels, sr, sr * block, block, bits)
+    return (b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(data)) + b"WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", len(data)) + data)
+
+
+def _time_call(fn, repeats: int) -> List[float]:
+    fn()  # warm
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_audio(args) -> dict:
+    """Per-format WAV decode and resample timings"""
+    from web_interface import decode_wav, resample
+
+    results = []
+    t = np.arange(int(args.seconds * max(args.rates))) / max(args.rates)
+    for sr in args.rates:
+        n = int(args.seconds * sr)
+        for channels in (1, 2):
+            signal = 0.5 * np.sin(2 * np.pi * 440 * t[:n])
+            signal = np.repeat(signal[:, None], channels, axis=1)
+            for name, tag, bits in AUDIO_FORMATS:
+                wav = make_wav(signal, sr, tag, bits)
+                audio, _ = decode_wav(wav)
+                decode = latency_summary(_time_call(lambda: decode_wav(wav), args.repeats))
+                convert = latency_summary(_time_call(lambda: resample(audio, sr), args.repeats))
+                results.append({
+                    "format": name,
+                    "sample_rate": sr,
+                    "channels": channels,
+                    "bytes": len(wav),
+                    "decode_ms": decode,
+                    "resample_ms": convert,
+                    "decode_mb_per_s": round(len(wav) / 1e6 / (decode["p50"] / 1000.0), 1) if decode["p50"] else None,
+                })
+
+    return {
+        "benchmark": "audio",
+        "clip_seconds": args.seconds,
+        "repeats": args.repeats,
+        "results": results,
+    }
+
+
+# ============================================================
+# INTENT KERNEL - NumPy kernel vs the sklearn pipeline
+# ============================================================
+
+INTENT_PHRASES = [
+    "nyalakan lampunya dong",
+    "robot maju yuk",
+    "belok kiri sekarang",
+    "berapa suhu sekarang",
+    "halo robot",
+]
+
+
+def bench_intent(args) -> dict:
+    """Parity and per-call latency of IntentKernel against predict_proba"""
+    from ml_ai import MLRobotAI
+
+    ml = MLRobotAI()
+    if not ml.load_model():
+        ml.train()
+    training, _ = ml.create_training_data()
+    texts = training + INTENT_PHRASES
+    max_diff = ml.check_kernel(texts)
+
+    pipeline, kernel = ml.pipeline, ml.kernel
+    batch = (texts * (args.batch // len(texts) + 1))[:args.batch]
+    single = {
+        "sklearn": latency_summary(_time_call(lambda: [pipeline.predict_proba([t]) for t in INTENT_PHRASES], args.repeats)),
+        "kernel": latency_summary(_time_call(lambda: [kernel.predict_proba(t) for t in INTENT_PHRASES], args.repeats)),
+    }
+    batched = {
+        "sklearn": latency_summary(_time_call(lambda: pipeline.predict_proba(batch), args.repeats)),
+        "kernel": latency_summary(_time_call(lambda: kernel.predict_proba_batch(batch), args.repeats)),
+    }
+
+    return {
+        "benchmark": "intent",
+        "parity": {"texts": len(texts), "max_abs_diff": max_diff, "ok": max_diff < 1e-9},
+        # Latencies cover all INTENT_PHRASES (single) or the whole batch
+        "single_ms": single,
+        "single_phrases": len(INTENT_PHRASES),
+        "batch_ms": batched,
+        "batch_size": len(batch),
+        "speedup_single": round(single["sklearn"]["p50"] / single["kernel"]["p50"], 1),
+        "speedup_batch": round(batched["sklearn"]["p50"] / batched["kernel"]["p50"], 1),
+    }
+
+
+# ============================================================
+# FAKE ARDUINO - pty device speaking the robot.ino protocol
+# ============================================================
+
+class FakeArduino:
+    """
+    Pseudo-terminal that answers like robot.ino: one reply line per
+    command, after a configurable processing latency. Point
+    RobotController at .port to benchmark without hardware.
+    """
+
+    def __init__(self, latency_ms: float = 5.0):
+        self.latency = latency_ms / 1000.0
+        self.commands = 0
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="fake-arduino", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def reply(command: str) -> str:
+        """Firmware reply for one command line"""
+        kind = command[:1]
+        if kind == "L":
+            parts = command[1:].split(";")[0].split(":")
+            state = {"0": "OFF", "1": "ON"}.get(parts[1] if len(parts) > 1 else "", "BLINK")
+            return f"OK: LED {'ALL' if parts[0] == 'A' else parts[0]} {state}"
+        if kind == "S":
+            return f"OK: Played {len(command[1:].split(';'))} tones"
+        if kind == "M" and len(command) > 1:
+            if command[1] == "S":
+                return "OK: Servo STOP"
+            parts = command.split(":")
+            return f"OK: Servo {command[1]} x{parts[2] if len(parts) > 2 else 1}"
+        if command in ("TR", "TQ"):
+            return "TEMP:25.0"
+        if command in ("HR", "HQ"):
+            return "HUMID:60.0"
+        if kind == "P":
+            return "PONG"
+        if kind == "D":
+            return f"OK: LCD {command[2:]}"
+        return "ERROR: Unknown command"
+
+    def _run(self):
+        os.write(self._master, b"READY\r\n")
+        buffer = b""
+        while self._running:
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                return
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.decode(errors="ignore").strip()
+                if not command:
+                    continue
+                if self.latency:
+                    time.sleep(self.latency)
+                self.commands += 1
+                os.write(self._master, (self.reply(command) + "\r\n").encode())
+
+    def close(self):
+        self._running = False
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+# ============================================================
+# PIPELINE BENCHMARK
+# ============================================================
+
+def run_load(fn: Callable, inputs: list, concurrency: int, requests: int) -> dict:
+    """Call fn over inputs (cycled) from `concurrency` threads"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn(inputs[i % len(inputs)])
+            ok = True
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    fn(inputs[0])  # warm
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / wall, 2) if wall else None,
+        "latency_ms": latency_summary(latencies),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def _load_clips(audio_dir: Optional[str]) -> List[bytes]:
+    if audio_dir:
+        clips = []
+        for path in sorted(glob.glob(os.path.join(audio_dir, "*.wav"))):
+            with open(path, "rb") as f:
+                clips.append(f.read())
+        if clips:
+            return clips
+    # Offline default: a one-second 16 kHz tone (exercises every stage
+    # except producing a meaningful transcript)
+    t = np.arange(16000) / 16000.0
+    return [make_wav((0.3 * np.sin(2 * np.pi * 440 * t))[:, None], 16000, 1, 16)]
+
+
+def _multipart(field: str, filename: str, payload: bytes, mimetype: str) -> tuple:
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {mimetype}\r\n\r\n").encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def bench_pipeline(args) -> dict:
+    """Component and end-to-end benchmarks against a fake Arduino"""
+    fake = FakeArduino(args.serial_latency_ms)
+    # web_interface reads its config at import time
+    os.environ["SERIAL_PORT"] = fake.port
+    os.environ.pop("SERIAL_PORTS", None)
+    # Measure the link itself, not repeats answered by the command scheduler
+    # or sensor reads answered from the telemetry cache
+    os.environ["COMMAND_COALESCE_MS"] = "0"
+    os.environ["TELEMETRY_MAX_AGE"] = "0"
+    os.environ["TELEMETRY_INTERVAL"] = "0"
+    import web_interface
+
+    from ml_ai import MLRobotAI
+    phrases, _ = MLRobotAI().create_training_data()
+    clips = _load_clips(args.audio_dir)
+    components = set(args.components)
+    results = {}
+
+    def measure(name: str, fn: Callable, inputs: list):
+        results[name] = [run_load(fn, inputs, c, args.requests) for c in args.concurrency]
+        print(f"✅ {name} done", file=sys.stderr)
+
+    if "intent" in components:
+        ml = MLRobotAI()
+        if not ml.load_model():
+            ml.train(save_model=False)
+        measure("intent", ml.predict, phrases)
+
+    if "voice_ai" in components:
+        ai = web_interface.VoiceAI(use_ml_model=True)
+        measure("voice_ai", ai.process_command, phrases)
+
+    if "serial" in components:
+        robot = web_interface.RobotController(fake.port, web_interface.Config.BAUD_RATE)
+        measure("serial", robot.send_command, ["TR", "HR", "MF:90:1", "L13:1:0", "P"])
+        robot.disconnect()
+
+    if components & {"stt", "http"}:
+        if not web_interface.warm_up.wait(args.warmup_timeout):
+            raise SystemExit(f"Warm-up failed: {web_interface.warm_up.snapshot()}")
+
+    if "stt" in components:
+        measure("stt", web_interface.transcriber.process_audio, clips)
+
+    if "http" in components:
+        from werkzeug.serving import make_server
+        server = make_server("127.0.0.1", 0, web_interface.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/api/process_audio"
+
+        def post(clip: bytes):
+            body, content_type = _multipart("audio", "clip.wav", clip, "audio/wav")
+            req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                resp.read()
+
+        measure("http_process_audio", post, clips)
+        server.shutdown()
+
+    fake.close()
+    return {
+        "benchmark": "pipeline",
+        "serial_latency_ms": args.serial_latency_ms,
+        "cpu_count": os.cpu_count(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "components": results,
+    }
+
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Voice Robot benchmarks")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--output", help="Also write the JSON result to this file")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    stt = sub.add_parser("stt", parents=[common], help="Compare Whisper inference backends")
+    stt.add_argument("--audio-dir", required=True, help="Directory of .wav clips (optional .txt transcripts)")
+    stt.add_argument("--backends", default="torch,int8,onnx")
+    stt.add_argument("--repeats", type=int, default=3)
+    stt.add_argument("--threads", type=int, default=0, help="torch threads (0 = default)")
+    stt.add_argument("--keep-texts", action="store_true", help="Include transcripts in the output")
+    stt.set_defaults(func=bench_stt)
+
+    audio = sub.add_parser("audio", parents=[common], help="WAV decode/resample microbenchmarks")
+    audio.add_argument("--seconds", type=float, default=5.0, help="Clip length")
+    audio.add_argument("--rates", type=int, nargs="+", default=[16000, 44100, 48000])
+    audio.add_argument("--repeats", type=int, default=50)
+    audio.set_defaults(func=bench_audio)
+
+    intent = sub.add_parser("intent", parents=[common], help="Intent kernel parity and latency vs sklearn")
+    intent.add_argument("--batch", type=int, default=256, help="Texts per batched call")
+    intent.add_argument("--repeats", type=int, default=200)
+    intent.set_defaults(func=bench_intent)
+
+    pipeline = sub.add_parser("pipeline", parents=[common], help="Components and /api/process_audio against a fake Arduino")
+    pipeline.add_argument("--components", nargs="+", default=["intent", "voice_ai", "serial", "stt", "http"],
+                          choices=["intent", "voice_ai", "serial", "stt", "http"])
+    pipeline.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    pipeline.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    pipeline.add_argument("--serial-latency-ms", type=float, default=5.0, help="Fake Arduino processing time")
+    pipeline.add_argument("--audio-dir", help="WAV clips for stt/http (default: synthetic tone)")
+    pipeline.add_argument("--warmup-timeout", type=float, default=300.0)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    args = parser.parse_args(argv)
+    emit(args.func(args), args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,13 +3,154 @@ ml_ai.py - Machine Learning AI untuk Voice Robot
 Menggunakan Scikit-learn untuk text classification
 """
 
-import pickle
+import argparse
+import contextlib
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
-from typing import Optional, List, Tuple
+# scikit-learn takes about a second to import; it is only needed to
+# train, so it is imported inside train() and the pipeline property
+from typing import Optional, List, Tuple, Dict, Iterable
+
+# Bump when the artifact layout changes; older files are rebuilt
+MODEL_FORMAT_VERSION = 3
+MODEL_FILE = 'robot_ml_model.npz'
+FEEDBACK_FILE = 'robot_ml_feedback.jsonl'  # Confirmed (text, label) pairs, one JSON object per line
+
+class IntentKernel:
+    """
+    NumPy-only inference for the TF-IDF + MultinomialNB pipeline.
+    Reproduces TfidfVectorizer's analyzer (lowercase, accent strip,
+    word unigrams and bigrams) with a token -> column dict, then
+    scores with one small dot product against feature_log_prob.
+    Probabilities match pipeline.predict_proba to float precision.
+    
+    Built with hashed(), n-grams map to CRC32 buckets instead of a
+    vocabulary and idf is all ones; that is the online-learning model.
+    """
+    
+    TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")  # sklearn's default
+    
+    def __init__(self, vocabulary: Optional[Iterable[str]], idf: np.ndarray, feature_log_prob: np.ndarray,
+                 class_log_prior: np.ndarray, classes: Iterable[str], ngram_range: Tuple[int, int] = (1, 2)):
+        self.idf = np.ascontiguousarray(idf, dtype=np.float64)
+        self.feature_log_prob = np.ascontiguousarray(feature_log_prob, dtype=np.float64)
+        self.class_log_prior = np.ascontiguousarray(class_log_prior, dtype=np.float64)
+        self.classes = [str(c) for c in classes]
+        self.ngram_range = tuple(ngram_range)
+        # (n_features, n_classes) copy, so the batch path gathers whole rows
+        self._log_prob_rows = np.ascontiguousarray(self.feature_log_prob.T)
+        
+        if vocabulary is None:
+            self.terms = np.empty(0, dtype=str)
+            self.index = None
+            mask = len(self.idf) - 1
+            self._column = lambda term: zlib.crc32(term.encode("utf-8")) & mask
+        else:
+            self.terms = np.asarray(list(vocabulary), dtype=str)
+            self.index = {str(term): i for i, term in enumerate(self.terms)}
+            self._column = self.index.get
+    
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "IntentKernel":
+        tfidf = pipeline.named_steps['tfidf']
+        nb = pipeline.named_steps['classifier']
+        return cls(tfidf.get_feature_names_out(), tfidf.idf_, nb.feature_log_prob_,
+                   nb.class_log_prior_, nb.classes_, tfidf.ngram_range)
+    
+    @classmethod
+    def hashed(cls, feature_log_prob: np.ndarray, class_log_prior: np.ndarray,
+               classes: Iterable[str], ngram_range: Tuple[int, int] = (1, 2)) -> "IntentKernel":
+        """Kernel over 2**k hashed n-gram buckets (k from feature_log_prob's width)"""
+        n_features = feature_log_prob.shape[1]
+        if n_features & (n_features - 1):
+            raise ValueError("hashed kernels need a power-of-two feature count")
+        return cls(None, np.ones(n_features), feature_log_prob, class_log_prior, classes, ngram_range)
+    
+    @property
+    def n_features(self) -> int:
+        return len(self.idf)
+    
+    @staticmethod
+    def _strip_accents(text: str) -> str:
+        normalized = unicodedata.normalize("NFKD", text)
+        if normalized == text:
+            return text
+        return "".join(c for c in normalized if not unicodedata.combining(c))
+    
+    def _columns(self, text: str) -> Dict[int, int]:
+        """Feature column -> term count for one text"""
+        tokens = self.TOKEN_PATTERN.findall(self._strip_accents(text.lower()))
+        counts = {}
+        column_of = self._column
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                column = column_of(" ".join(tokens[i:i + n]) if n > 1 else tokens[i])
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+        return counts
+    
+    def features(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sparse L2-normalized tf-idf rows as (row, column, value) arrays,
+        grouped by row in input order
+        """
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            counts = self._columns(text)
+            rows.extend([row] * len(counts))
+            columns.extend(counts.keys())
+            values.extend(counts.values())
+        
+        rows = np.asarray(rows, dtype=np.intp)
+        columns = np.asarray(columns, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64) * self.idf[columns]
+        norms = np.bincount(rows, weights=values * values, minlength=len(texts))
+        values /= np.sqrt(norms[rows])
+        return rows, columns, values
+    
+    @staticmethod
+    def _softmax(jll: np.ndarray) -> np.ndarray:
+        jll = jll - jll.max(axis=-1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=-1, keepdims=True)
+        return jll
+    
+    def predict_proba(self, text: str) -> np.ndarray:
+        """Class probabilities for one text (same order as classes)"""
+        counts = self._columns(text)
+        if not counts:
+            return self._softmax(self.class_log_prior.copy())
+        
+        columns = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        weights *= self.idf[columns]
+        weights /= np.sqrt(weights @ weights)
+        return self._softmax(self.feature_log_prob[:, columns] @ weights + self.class_log_prior)
+    
+    def predict_proba_batch(self, texts: List[str]) -> np.ndarray:
+        """Class probabilities for many texts, shape (len(texts), n_classes)"""
+        rows, columns, values = self.features(texts)
+        jll = np.zeros((len(texts), len(self.classes)))
+        if len(rows):
+            # Sum each text's weighted log-prob rows; texts without known
+            # n-grams keep zeros and score on the prior alone
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            contributions = self._log_prob_rows[columns] * values[:, None]
+            jll[rows[starts]] = np.add.reduceat(contributions, starts, axis=0)
+        jll += self.class_log_prior
+        return self._softmax(jll)
 
 class MLRobotAI:
     """
@@ -18,8 +159,38 @@ class MLRobotAI:
     - Naive Bayes untuk classification
     """
     
-    def __init__(self):
-        self.pipeline = None
+    VECTORIZER_PARAMS = {
+        "ngram_range": (1, 2),  # Unigrams and bigrams
+        "lowercase": True,
+        "strip_accents": "unicode",
+    }
+    MAX_FEATURES = 100
+    NB_ALPHA = 0.1
+    ONLINE_FEATURES = 2 ** 14  # Hashed n-gram buckets in online mode
+    SAVE_DELAY = 30  # Seconds learn() waits to save, so bursts of feedback cost one save
+    
+    def __init__(self, cache_size: int = 1024, online: bool = False, feedback_file: str = FEEDBACK_FILE):
+        self._pipeline = None
+        self.kernel = None  # Serves every prediction; replaced, never mutated
+        
+        # Online mode: hashed features and NB counts that learn() extends
+        self.online = online
+        self.feedback_file = feedback_file
+        self.feature_count = None
+        self.class_count = None
+        self.learned = 0  # Feedback pairs folded into the counts
+        self.feedback_offset = 0  # Bytes of the feedback log read so far (whole lines only)
+        self._learn_lock = threading.Lock()
+        self._save_timer = None  # Pending save scheduled by learn()
+        
+        # LRU cache: normalized text -> (label, confidence, command)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._generation = 0  # Bumped on every model swap
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
         self.command_map = {
             # Individual lights control
             "red_light_on": "L13:1:0",
@@ -179,51 +350,352 @@ class MLRobotAI:
     def train(self, save_model: bool = True):
         """Train the ML model"""
         print("🧠 Training ML model...")
+        from sklearn.model_selection import train_test_split
         
         # Get training data
         texts, labels = self.create_training_data()
         
-        # Create pipeline
-        self.pipeline = Pipeline([
-            ('tfidf', TfidfVectorizer(
-                ngram_range=(1, 2),  # Unigrams and bigrams
-                max_features=100,
-                lowercase=True,
-                strip_accents='unicode'
-            )),
-            ('classifier', MultinomialNB(alpha=0.1))
-        ])
-        
-        # Train
-        self.pipeline.fit(texts, labels)
-        self.is_trained = True
-        
-        # Calculate accuracy
+        # Accuracy on a held-out split, then the deployed model is fit on everything
         X_train, X_test, y_train, y_test = train_test_split(
             texts, labels, test_size=0.2, random_state=42
         )
-        self.pipeline.fit(X_train, y_train)
-        accuracy = self.pipeline.score(X_test, y_test)
         
+        if self.online:
+            feature_count, class_count = self._count(X_train, y_train)
+            probas = self._hashed_kernel(feature_count, class_count).predict_proba_batch(X_test)
+            accuracy = float(np.mean(np.asarray(self.online_classes)[probas.argmax(axis=1)] == np.asarray(y_test)))
+            
+            # Confirmed production utterances are part of the corpus
+            feedback, self.feedback_offset = self.read_feedback()
+            if feedback:
+                texts = texts + [text for text, _ in feedback]
+                labels = labels + [label for _, label in feedback]
+            self.feature_count, self.class_count = self._count(texts, labels)
+            self.learned = len(feedback)
+            kernel = self._hashed_kernel(self.feature_count, self.class_count)
+        else:
+            self.pipeline = self._new_pipeline().fit(X_train, y_train)
+            accuracy = self.pipeline.score(X_test, y_test)
+            
+            self.pipeline = self._new_pipeline().fit(texts, labels)
+            kernel = IntentKernel.from_pipeline(self.pipeline)
+        
+        self._swap(kernel)
         print(f"✅ Model trained! Accuracy: {accuracy*100:.1f}%")
         
         # Save model
         if save_model:
-            with open('robot_ml_model.pkl', 'wb') as f:
-                pickle.dump(self.pipeline, f)
-            print("💾 Model saved to robot_ml_model.pkl")
+            self.save_model()
     
-    def load_model(self, filename: str = 'robot_ml_model.pkl'):
-        """Load trained model"""
-        try:
-            with open(filename, 'rb') as f:
-                self.pipeline = pickle.load(f)
+    def _new_pipeline(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+        
+        return Pipeline([
+            ('tfidf', TfidfVectorizer(max_features=self.MAX_FEATURES, **self.VECTORIZER_PARAMS)),
+            ('classifier', MultinomialNB(alpha=self.NB_ALPHA))
+        ])
+    
+    def _swap(self, kernel: IntentKernel):
+        """Publish a new model; in-flight predictions finish on the old one"""
+        with self._cache_lock:
+            self.kernel = kernel
             self.is_trained = True
-            print(f"✅ Model loaded from {filename}")
-            return True
+            self._generation += 1
+            self._cache.clear()
+    
+    # ---------------------------------------------
+    # Online learning (hashed features + NB counts)
+    # ---------------------------------------------
+    
+    @property
+    def online_classes(self) -> List[str]:
+        """Every label with a command, so any of them can be learned later"""
+        return sorted(self.command_map)
+    
+    def _count(self, texts: List[str], labels: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """MultinomialNB sufficient statistics for hashed, L2-normalized tf rows"""
+        classes = self.online_classes
+        feature_count = np.zeros((len(classes), self.ONLINE_FEATURES))
+        class_count = np.zeros(len(classes))
+        self._add_counts(feature_count, class_count, texts, labels)
+        return feature_count, class_count
+    
+    def _add_counts(self, feature_count: np.ndarray, class_count: np.ndarray,
+                    texts: List[str], labels: List[str]):
+        position = {label: i for i, label in enumerate(self.online_classes)}
+        targets = np.array([position[label] for label in labels], dtype=np.intp)
+        featurizer = self.kernel if self.kernel is not None and self.kernel.index is None \
+            else self._hashed_kernel(np.zeros_like(feature_count), np.ones_like(class_count))
+        rows, columns, values = featurizer.features(texts)
+        np.add.at(feature_count, (targets[rows], columns), values)
+        class_count += np.bincount(targets, minlength=len(class_count))
+    
+    def _hashed_kernel(self, feature_count: np.ndarray, class_count: np.ndarray) -> IntentKernel:
+        """Same smoothing as MultinomialNB(alpha=NB_ALPHA)"""
+        smoothed = feature_count + self.NB_ALPHA
+        feature_log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        with np.errstate(divide="ignore"):
+            # Labels never seen yet get probability zero
+            class_log_prior = np.log(class_count) - np.log(class_count.sum())
+        return IntentKernel.hashed(feature_log_prob, class_log_prior, self.online_classes,
+                                   self.VECTORIZER_PARAMS["ngram_range"])
+    
+    def partial_fit(self, texts: List[str], labels: List[str]):
+        """
+        Fold new (text, label) pairs into the online model and swap it
+        in. Cost is proportional to the new pairs (plus one pass over
+        the fixed-size count matrix), not to the corpus.
+        """
+        if not self.online:
+            raise ValueError("partial_fit() needs MLRobotAI(online=True)")
+        unknown = sorted(set(labels) - set(self.command_map))
+        if unknown:
+            raise ValueError(f"Unknown label(s): {', '.join(unknown)}")
+        if not self.is_trained:
+            self.train()
+        
+        # Update copies so predictions never see half-applied counts
+        feature_count = self.feature_count.copy()
+        class_count = self.class_count.copy()
+        self._add_counts(feature_count, class_count, texts, labels)
+        kernel = self._hashed_kernel(feature_count, class_count)
+        
+        self.feature_count, self.class_count = feature_count, class_count
+        self._swap(kernel)
+    
+    def learn(self, pairs: List[Tuple[str, str]], save_model: bool = True) -> int:
+        """
+        Learn confirmed (text, label) pairs: append them to the feedback
+        log and fold everything new in the log into the live model.
+        The counts are saved SAVE_DELAY seconds later, in the background;
+        until then the log alone is enough to rebuild them.
+        Returns the number of pairs learned.
+        """
+        pairs = [(text, label) for text, label in pairs if text and text.strip()]
+        if not pairs:
+            return 0
+        if not self.online:
+            raise ValueError("learn() needs MLRobotAI(online=True)")
+        unknown = sorted(set(label for _, label in pairs) - set(self.command_map))
+        if unknown:
+            raise ValueError(f"Unknown label(s): {', '.join(unknown)}")
+        
+        with self._learn_lock:
+            if not self.is_trained:
+                self.train()
+            lines = "".join(
+                json.dumps({"text": text, "label": label, "ts": round(time.time(), 3)}, ensure_ascii=False) + "\n"
+                for text, label in pairs
+            )
+            with open(self.feedback_file, "a+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    f.seek(end - 1)
+                    if f.read(1) != b"\n":
+                        lines = "\n" + lines  # A crash tore the last line; don't glue onto it
+                f.write(lines.encode("utf-8"))
+            # Read back from the last offset, so pairs another process logged are learned too
+            self._fold_feedback()
+            if save_model:
+                self._schedule_save()
+        return len(pairs)
+    
+    def _fold_feedback(self) -> int:
+        """partial_fit the pairs logged after feedback_offset; returns how many"""
+        pending, offset = self.read_feedback(self.feedback_offset)
+        if pending:
+            self.partial_fit([text for text, _ in pending], [label for _, label in pending])
+        self.feedback_offset = offset
+        self.learned += len(pending)
+        return len(pending)
+    
+    def _schedule_save(self):
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush_save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush_save(self):
+        """Save now if learn() left a save pending (e.g. at shutdown)"""
+        with self._learn_lock:
+            timer, self._save_timer = self._save_timer, None
+            if timer is None:
+                return
+            timer.cancel()
+            self.save_model()
+    
+    def read_feedback(self, offset: int = 0) -> Tuple[List[Tuple[str, str]], int]:
+        """
+        Confirmed pairs from the feedback log, starting `offset` bytes in.
+        Returns (pairs, offset just past the last complete line).
+        """
+        pairs = []
+        try:
+            with open(self.feedback_file, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Still being written (or torn by a crash); read again later
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("label") in self.command_map and entry.get("text"):
+                        pairs.append((entry["text"], entry["label"]))
+        except FileNotFoundError:
+            pass
+        return pairs, offset
+    
+    def data_hash(self) -> str:
+        """Fingerprint of everything the trained weights depend on"""
+        texts, labels = self.create_training_data()
+        payload = json.dumps({
+            "format": MODEL_FORMAT_VERSION,
+            "data": list(zip(texts, labels)),
+            "vectorizer": self.VECTORIZER_PARAMS,
+            "max_features": self.MAX_FEATURES,
+            "alpha": self.NB_ALPHA,
+            "online": [self.ONLINE_FEATURES, self.online_classes] if self.online else None,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def save_model(self, filename: str = MODEL_FILE):
+        """
+        Save the trained weights as plain arrays (.npz, no pickle):
+        vocabulary, idf, NB log-probabilities, classes and a metadata
+        record with the format version and training-data hash.
+        """
+        kernel = self.kernel
+        meta = {
+            "format": MODEL_FORMAT_VERSION,
+            "mode": "online" if self.online else "tfidf",
+            "data_hash": self.data_hash(),
+        }
+        if self.online:
+            # Raw counts, so learning can resume after a restart; the
+            # log-probabilities are derived from them on load
+            meta["feedback_offset"] = self.feedback_offset
+            meta["feedback_pairs"] = self.learned
+            arrays = {"feature_count": self.feature_count, "class_count": self.class_count}
+        else:
+            arrays = {
+                "vocabulary": kernel.terms,
+                "idf": kernel.idf,
+                "feature_log_prob": kernel.feature_log_prob,
+                "class_log_prior": kernel.class_log_prior,
+            }
+        
+        # Write next to the target, then swap, so readers never see half a file
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                classes=np.asarray(kernel.classes, dtype=str),
+                **arrays,
+            )
+        os.replace(tmp, filename)
+        print(f"💾 Model saved to {filename}")
+    
+    def load_model(self, filename: str = MODEL_FILE) -> bool:
+        """
+        Load weights saved by save_model(). Returns False (so the caller
+        retrains) when the file is missing, from another format version,
+        or built from different training data.
+        """
+        try:
+            with np.load(filename, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("format") != MODEL_FORMAT_VERSION:
+                    print(f"⚠️ Model file {filename} has format {meta.get('format')}, expected {MODEL_FORMAT_VERSION}")
+                    return False
+                mode = "online" if self.online else "tfidf"
+                if meta.get("mode") != mode:
+                    print(f"⚠️ Model file {filename} holds a {meta.get('mode')} model, expected {mode}")
+                    return False
+                if meta.get("data_hash") != self.data_hash():
+                    print(f"⚠️ Model file {filename} is stale (training data changed)")
+                    return False
+                arrays = {key: data[key] for key in data.files if key != "meta"}
         except FileNotFoundError:
             print(f"⚠️ Model file not found: {filename}")
             return False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Model file {filename} is unreadable: {e}")
+            return False
+        
+        if self.online:
+            self.feature_count = arrays["feature_count"]
+            self.class_count = arrays["class_count"]
+            self.feedback_offset = meta["feedback_offset"]
+            self.learned = meta["feedback_pairs"]
+            kernel = self._hashed_kernel(self.feature_count, self.class_count)
+        else:
+            kernel = IntentKernel(
+                arrays["vocabulary"], arrays["idf"], arrays["feature_log_prob"],
+                arrays["class_log_prior"], arrays["classes"], self.VECTORIZER_PARAMS["ngram_range"],
+            )
+        self._pipeline = None  # Rebuilt from the arrays only if asked for
+        self._swap(kernel)
+        print(f"✅ Model loaded from {filename}")
+        
+        if self.online:
+            # Pairs logged after this file was saved (e.g. by another process)
+            with self._learn_lock:
+                folded = self._fold_feedback()
+            if folded:
+                print(f"📚 Folded in {folded} logged feedback pairs")
+        return True
+    
+    @property
+    def pipeline(self):
+        """
+        The sklearn pipeline; after load_model() it is rebuilt from the
+        kernel's arrays. None for online models, which have no sklearn twin.
+        """
+        if self._pipeline is None and self.kernel is not None and self.kernel.index is not None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.naive_bayes import MultinomialNB
+            from sklearn.pipeline import Pipeline
+            
+            kernel = self.kernel
+            tfidf = TfidfVectorizer(vocabulary=kernel.index, **self.VECTORIZER_PARAMS)
+            tfidf.idf_ = kernel.idf
+            
+            nb = MultinomialNB(alpha=self.NB_ALPHA)
+            nb.classes_ = np.asarray(kernel.classes, dtype=object)
+            nb.feature_log_prob_ = kernel.feature_log_prob
+            nb.class_log_prior_ = kernel.class_log_prior
+            nb.n_features_in_ = len(kernel.index)
+            
+            self._pipeline = Pipeline([('tfidf', tfidf), ('classifier', nb)])
+        return self._pipeline
+    
+    @pipeline.setter
+    def pipeline(self, value):
+        self._pipeline = value
+    
+    def check_kernel(self, texts: Optional[List[str]] = None) -> float:
+        """
+        Largest absolute difference between the kernel's probabilities
+        (single and batched) and pipeline.predict_proba over texts
+        (default: the training phrases). Should be ~1e-15.
+        """
+        if texts is None:
+            texts, _ = self.create_training_data()
+        single = np.array([self.kernel.predict_proba(text) for text in texts])
+        # Online models are checked single against batched
+        expected = single if self.pipeline is None else self.pipeline.predict_proba(texts)
+        batched = self.kernel.predict_proba_batch(texts)
+        return float(max(np.abs(single - expected).max(), np.abs(batched - expected).max()))
+    
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize a transcript for use as a cache key"""
+        return " ".join(text.lower().split())
     
     def predict(self, text: str) -> Tuple[str, float]:
         """
@@ -233,14 +705,112 @@ class MLRobotAI:
         if not self.is_trained:
             raise Exception("Model not trained! Call train() or load_model() first.")
         
-        # Predict
-        label = self.pipeline.predict([text])[0]
+        # One probability pass; the label is its argmax
+        kernel = self.kernel
+        probas = kernel.predict_proba(text)
+        best = int(np.argmax(probas))
+        
+        return kernel.classes[best], float(probas[best])
+    
+    def predict_proba_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Class probabilities for many texts, shape (len(texts), n_classes),
+        columns in self.kernel.classes order. Repeated transcripts are
+        scored once.
+        """
+        return self._proba_batch(texts)[0]
+    
+    def _proba_batch(self, texts: List[str]) -> Tuple[np.ndarray, List[str]]:
+        """predict_proba_batch() plus the classes of the kernel that scored it"""
+        if not self.is_trained:
+            raise Exception("Model not trained! Call train() or load_model() first.")
+        
+        kernel = self.kernel
+        keys = [self.normalize_text(text) for text in texts]
+        unique = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+        probas = kernel.predict_proba_batch(list(unique))
+        if len(unique) != len(keys):
+            probas = probas[[unique[key] for key in keys]]
+        return probas, kernel.classes
+    
+    def predict_batch(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """
+        Vectorized predict()
+        Returns: [(label, confidence), ...]
+        """
+        if not texts:
+            return []
+        probas, classes = self._proba_batch(texts)
+        best = probas.argmax(axis=1)
+        confidence = probas[np.arange(len(best)), best]
+        return [(classes[i], float(c)) for i, c in zip(best, confidence)]
+    
+    def top_k_batch(self, texts: List[str], top_k: int = 3) -> List[List[Tuple[str, float]]]:
+        """Vectorized get_all_predictions()"""
+        if not texts:
+            return []
+        probas, classes = self._proba_batch(texts)
+        order = np.argsort(-probas, axis=1, kind="stable")[:, :top_k]
+        return [
+            [(classes[i], float(p)) for i, p in zip(row, probas[r, row])]
+            for r, row in enumerate(order)
+        ]
+    
+    def process_commands(self, texts: List[str], threshold: float = 0.5) -> List[Optional[str]]:
+        """Vectorized process_command() without the printing"""
+        if not self.is_trained:
+            self.train()
+        return [
+            self.command_map.get(label) if text and confidence >= threshold else None
+            for text, (label, confidence) in zip(texts, self.predict_batch(texts))
+        ]
+    
+    def classify(self, text: str) -> Tuple[str, float, Optional[str], bool]:
+        """
+        Cached prediction
+        Returns: (label, confidence, command, cache_hit)
+        """
+        key = self.normalize_text(text)
+        
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return entry + (True,)
+            self.cache_misses += 1
+            generation = self._generation
+        
+        label, confidence = self.predict(key)
+        entry = (label, confidence, self.command_map.get(label))
         
-        # Get probability
-        probas = self.pipeline.predict_proba([text])[0]
-        confidence = max(probas)
+        with self._cache_lock:
+            if generation != self._generation:
+                # The model was swapped meanwhile; don't cache the old answer
+                return entry + (False,)
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
         
-        return label, confidence
+        return entry + (False,)
+    
+    def clear_cache(self):
+        """Drop cached predictions (after the model changes)"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def cache_stats(self) -> Dict[str, float]:
+        """Cache hit/miss counters"""
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                "size": len(self._cache),
+                "capacity": self.cache_size,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / total if total else 0.0,
+            }
     
     def process_command(self, text: str, threshold: float = 0.5, verbose: bool = True) -> Optional[str]:
         """
@@ -257,11 +827,11 @@ class MLRobotAI:
         if verbose:
             print(f"\n🤖 ML Processing: '{text}'")
         
-        # Predict
-        label, confidence = self.predict(text)
+        # Predict (served from the LRU cache when the text was seen before)
+        label, confidence, command, cached = self.classify(text)
         
         if verbose:
-            print(f"🎯 Predicted: {label} (confidence: {confidence*100:.1f}%)")
+            print(f"🎯 Predicted: {label} (confidence: {confidence*100:.1f}%){' [cached]' if cached else ''}")
         
         # Check confidence threshold
         if confidence < threshold:
@@ -269,9 +839,6 @@ class MLRobotAI:
                 print(f"⚠️ Low confidence ({confidence*100:.1f}% < {threshold*100:.1f}%)")
             return None
         
-        # Get Arduino command
-        command = self.command_map.get(label)
-        
         if verbose:
             if command:
                 print(f"✅ Command: {command}")
@@ -286,8 +853,9 @@ class MLRobotAI:
             return []
         
         # Get all probabilities
-        probas = self.pipeline.predict_proba([text])[0]
-        classes = self.pipeline.classes_
+        kernel = self.kernel
+        probas = kernel.predict_proba(text)
+        classes = kernel.classes
         
         # Sort by probability
         indices = np.argsort(probas)[::-1][:top_k]
@@ -341,7 +909,62 @@ def test_ml_ai():
         print("-"*60)
 
 
-if __name__ == "__main__":
+# ===============================================
+# BULK CLASSIFICATION
+# ===============================================
+
+def classify_file(ai: MLRobotAI, source, sink, fmt: str = "jsonl", top_k: int = 3,
+                  chunk_size: int = 10000) -> int:
+    """
+    Classify one transcript per line from source, streaming chunk by
+    chunk, and write label, confidence, command and top-k to sink as
+    JSONL or CSV. Returns the number of lines written.
+    """
+    classes = ai.kernel.classes
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(sink)
+        header = ["text", "label", "confidence", "command"]
+        for i in range(1, top_k + 1):
+            header += [f"label_{i}", f"prob_{i}"]
+        writer.writerow(header)
+    
+    lines = (line.rstrip("\r\n") for line in source)
+    total = 0
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            break
+        
+        probas = ai.predict_proba_batch(chunk)
+        order = np.argsort(-probas, axis=1, kind="stable")[:, :top_k]
+        
+        for text, row, probs in zip(chunk, order, probas):
+            label = classes[row[0]]
+            confidence = round(float(probs[row[0]]), 6)
+            command = ai.command_map.get(label)
+            if writer is not None:
+                record = [text, label, confidence, command or ""]
+                for i in row:
+                    record += [classes[i], round(float(probs[i]), 6)]
+                writer.writerow(record)
+            else:
+                sink.write(json.dumps({
+                    "text": text,
+                    "label": label,
+                    "confidence": confidence,
+                    "command": command,
+                    "top_k": [[classes[i], round(float(probs[i]), 6)] for i in row],
+                }, ensure_ascii=False) + "\n")
+        
+        total += len(chunk)
+        print(f"📊 {total} lines classified", file=sys.stderr)
+    
+    return total
+
+
+def interactive():
+    """Test run followed by an interactive prompt"""
     # Run test
     test_ml_ai()
     
@@ -372,4 +995,61 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             break
     
-    print("\n👋 Selesai!")
\ No newline at end of file
+    print("\n👋 Selesai!")
+
+
+def _positive_int(value: str) -> int:
+    """argparse type: an integer >= 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ML AI for the Voice Robot")
+    sub = parser.add_subparsers(dest="command")
+    
+    classify = sub.add_parser("classify", help="Classify a file of transcripts (one per line)")
+    classify.add_argument("input", help="Transcript file, or - for stdin")
+    classify.add_argument("-o", "--output", help="Output file (default: stdout)")
+    classify.add_argument("--format", choices=["jsonl", "csv"],
+                          help="Output format (default: from the output extension, else jsonl)")
+    classify.add_argument("--top-k", type=_positive_int, default=3)
+    classify.add_argument("--chunk-size", type=_positive_int, default=10000, help="Lines per vectorized batch")
+    classify.add_argument("--model", default=MODEL_FILE)
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        interactive()
+        return 0
+    
+    fmt = args.format or ("csv" if (args.output or "").lower().endswith(".csv") else "jsonl")
+    
+    ai = MLRobotAI()
+    # Progress goes to stderr so stdout stays clean for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        if not ai.load_model(args.model):
+            ai.train(save_model=False)
+            ai.save_model(args.model)
+    
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", errors="replace")
+    sink = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        start = time.perf_counter()
+        total = classify_file(ai, source, sink, fmt, args.top_k, args.chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f"✅ {total} lines in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s)", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -144,7 +144,8 @@ void loop() {
 // ============================================================
 
 void serialEvent() {
-  while (Serial.available()) {
+  // Leave pipelined commands in the RX buffer until this one is handled
+  while (!commandReady && Serial.available()) {
     char inChar = (char)Serial.read();
     
     if (inChar == '\n' || inChar == '\r') {
@@ -190,10 +191,12 @@ void processCommand(char* cmd) {
       break;
     case 'T':  // Temperature
       if (cmd[1] == 'R') handleTemperature();
+      else if (cmd[1] == 'Q') handleSensorQuery('T');
       else sendError("Unknown command");
       break;
     case 'H':  // Humidity
       if (cmd[1] == 'R') handleHumidity();
+      else if (cmd[1] == 'Q') handleSensorQuery('H');
       else sendError("Unknown command");
       break;
     case 'D':  // Display (LCD)
@@ -557,6 +560,39 @@ void handleHumidity() {
   Serial.println(humidity, 1);
 }
 
+// ============================================================
+// SENSOR QUERY (background polling)
+// ============================================================
+
+void handleSensorQuery(char kind) {
+  // TQ / HQ: same reply as TR / HR, but no LCD, no auto LED and a
+  // failed read doesn't count towards MAX_ERRORS
+  int result = DHT.read(DHT_PIN);
+  
+  if (result != 0) {
+    Serial.println("ERROR: DHT sensor failed");
+    return;
+  }
+  
+  if (kind == 'T') {
+    float temp = DHT.temperature;
+    if (temp < MIN_TEMP || temp > MAX_TEMP) {
+      Serial.println("ERROR: Invalid temperature");
+      return;
+    }
+    Serial.print("TEMP:");
+    Serial.println(temp, 1);
+  } else {
+    float humidity = DHT.humidity;
+    if (humidity < MIN_HUMIDITY || humidity > MAX_HUMIDITY) {
+      Serial.println("ERROR: Invalid humidity");
+      return;
+    }
+    Serial.print("HUMID:");
+    Serial.println(humidity, 1);
+  }
+}
+
 // ============================================================
 // LCD HANDLER
 // ============================================================
@@ -0,0 +1,152 @@
+"""
+serve.py - Production server for the Voice Robot
+Runs the Flask app without the Werkzeug dev server or its reloader
+
+Usage:
+    python serve.py                       # gunicorn if installed, else waitress
+    python serve.py --threads 16 --port 8080
+    python serve.py --server waitress     # Windows
+
+Models and the Arduino link are loaded exactly once, in the one worker
+process that serves requests. That process owns the serial port(s), the
+command history and the Whisper micro-batcher, none of which can be
+shared between forked workers, so concurrency comes from a thread pool
+(SERVER_THREADS) plus the Whisper worker processes (STT_WORKERS).
+
+On SIGTERM/SIGINT the server stops accepting connections, ends open
+/api/events streams, lets in-flight requests finish (up to
+SHUTDOWN_TIMEOUT seconds) and then runs cleanup().
+"""
+
+import _thread
+import argparse
+import signal
+import threading
+import time
+
+from web_interface import Config
+
+
+# ============================================================
+# GUNICORN (Linux / macOS)
+# ============================================================
+
+def run_gunicorn(host: str, port: int, threads: int):
+    from gunicorn.app.base import BaseApplication
+
+    def post_worker_init(worker):
+        import web_interface
+        web_interface.warm_up.start()
+        
+        # End event streams on SIGTERM so they don't hold the graceful drain open
+        handle_exit = signal.getsignal(signal.SIGTERM)
+        
+        def on_term(signum, frame):
+            web_interface.events.close()
+            handle_exit(signum, frame)
+        
+        signal.signal(signal.SIGTERM, on_term)
+
+    def worker_exit(server, worker):
+        import web_interface
+        web_interface.cleanup()
+
+    class RobotServer(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": 1,
+                "worker_class": "gthread",
+                "threads": threads,
+                "graceful_timeout": int(Config.SHUTDOWN_TIMEOUT),
+                "timeout": 120,
+                "keepalive": 5,
+                "post_worker_init": post_worker_init,
+                "worker_exit": worker_exit,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import web_interface
+            return web_interface.app
+
+    # The arbiter never loads anything; the worker cleans up in worker_exit
+    import atexit
+    import web_interface
+    atexit.unregister(web_interface.cleanup)
+    RobotServer().run()
+
+
+# ============================================================
+# WAITRESS (any platform)
+# ============================================================
+
+def run_waitress(host: str, port: int, threads: int):
+    from waitress import create_server
+    import web_interface
+
+    web_interface.warm_up.start()
+    server = create_server(web_interface.app, host=host, port=port, threads=threads)
+    stopping = threading.Event()
+    drained = threading.Event()
+
+    def drain():
+        dispatcher = server.task_dispatcher
+        deadline = time.monotonic() + Config.SHUTDOWN_TIMEOUT
+        while time.monotonic() < deadline and (dispatcher.active_count or dispatcher.queue):
+            time.sleep(0.05)
+        # Re-enters on_signal on the main thread, which stops server.run()
+        drained.set()
+        _thread.interrupt_main()
+
+    def on_signal(signum, frame):
+        if drained.is_set():
+            raise KeyboardInterrupt
+        if stopping.is_set():
+            return
+        stopping.set()
+        web_interface.log.info("🛑 Draining in-flight requests...")
+        server.accepting = False
+        web_interface.events.close()  # Open event streams would never drain
+        threading.Thread(target=drain, name="drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    web_interface.log.info("🌐 Serving on http://%s:%s (waitress, %d threads)", host, port, threads)
+    try:
+        server.run()
+    finally:
+        web_interface.cleanup()
+
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Production server for the Voice Robot")
+    parser.add_argument("--host", default=Config.HOST)
+    parser.add_argument("--port", type=int, default=Config.PORT)
+    parser.add_argument("--threads", type=int, default=Config.SERVER_THREADS,
+                        help="Concurrent requests (default: SERVER_THREADS)")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "waitress"], default="auto")
+    args = parser.parse_args()
+
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "waitress"
+
+    if server == "gunicorn":
+        run_gunicorn(args.host, args.port, args.threads)
+    else:
+        run_waitress(args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ class VoiceControl {
         this.mediaRecorder = null;
         this.audioChunks = [];
         
+        // Streaming state (PCM chunks sent while recording)
+        this.stream = null;
+        this.streamSession = null;
+        this.streamSource = null;
+        this.streamProcessor = null;
+        this.streamQueue = Promise.resolve();
+        
         // DOM Elements
         this.micButton = document.getElementById('micButton');
         this.micIcon = document.getElementById('micIcon');
@@ -85,29 +92,15 @@ class VoiceControl {
         try {
             // Request microphone access
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+            this.stream = stream;
             
-            // Initialize MediaRecorder
-            this.mediaRecorder = new MediaRecorder(stream);
-            this.audioChunks = [];
-            
-            // Handle data available
-            this.mediaRecorder.ondataavailable = (event) => {
-                if (event.data.size > 0) {
-                    this.audioChunks.push(event.data);
-                }
-            };
-            
-            // Handle recording stop
-            this.mediaRecorder.onstop = async () => {
-                const audioBlob = new Blob(this.audioChunks, { type: 'audio/wav' });
-                await this.sendAudioToServer(audioBlob);
-                
-                // Stop all tracks in the stream
-                stream.getTracks().forEach(track => track.stop());
-            };
+            // Prefer streaming PCM so the server can transcribe while we talk;
+            // fall back to uploading the whole clip if that is unavailable
+            const streaming = await this.startStreaming(stream);
+            if (!streaming) {
+                this.startMediaRecorder(stream);
+            }
             
-            // Start recording
-            this.mediaRecorder.start();
             this.isListening = true;
             
             // Update UI
@@ -131,11 +124,127 @@ class VoiceControl {
         }
     }
     
+    startMediaRecorder(stream) {
+        // Initialize MediaRecorder
+        this.mediaRecorder = new MediaRecorder(stream);
+        this.audioChunks = [];
+        
+        // Handle data available
+        this.mediaRecorder.ondataavailable = (event) => {
+            if (event.data.size > 0) {
+                this.audioChunks.push(event.data);
+            }
+        };
+        
+        // Handle recording stop
+        this.mediaRecorder.onstop = async () => {
+            // MediaRecorder produces WebM/Opus or OGG, not WAV
+            const mimeType = this.mediaRecorder.mimeType || 'audio/webm';
+            const audioBlob = new Blob(this.audioChunks, { type: mimeType });
+            await this.sendAudioToServer(audioBlob);
+            
+            // Stop all tracks in the stream
+            stream.getTracks().forEach(track => track.stop());
+        };
+        
+        // Start recording
+        this.mediaRecorder.start();
+    }
+    
+    async startStreaming(stream) {
+        try {
+            const response = await fetch('/api/stream/start', { method: 'POST' });
+            if (!response.ok) {
+                return false;
+            }
+            const session = await response.json();
+            
+            // Let the browser resample the microphone to the server rate
+            this.audioContext = new AudioContext({ sampleRate: session.sample_rate });
+            this.streamSource = this.audioContext.createMediaStreamSource(stream);
+            this.streamProcessor = this.audioContext.createScriptProcessor(2048, 1, 1);
+            this.streamSession = session.session_id;
+            this.streamQueue = Promise.resolve();
+            
+            this.streamProcessor.onaudioprocess = (event) => {
+                const input = event.inputBuffer.getChannelData(0);
+                const pcm = new Int16Array(input.length);
+                for (let i = 0; i < input.length; i++) {
+                    const s = Math.max(-1, Math.min(1, input[i]));
+                    pcm[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+                }
+                this.sendStreamRequest(`/api/stream/${session.session_id}/chunk`, pcm.buffer);
+            };
+            
+            this.streamSource.connect(this.streamProcessor);
+            this.streamProcessor.connect(this.audioContext.destination);
+            return true;
+            
+        } catch (error) {
+            console.warn('Streaming unavailable, falling back to upload:', error);
+            this.stopStreaming(false);
+            return false;
+        }
+    }
+    
+    sendStreamRequest(url, body) {
+        // Chain requests so chunks reach the server in capture order
+        this.streamQueue = this.streamQueue
+            .then(() => fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: body
+            }))
+            .then(response => response.json())
+            .then(data => this.handleStreamResults(data))
+            .catch(error => console.error('Error streaming audio:', error));
+        return this.streamQueue;
+    }
+    
+    handleStreamResults(data) {
+        if (!data || !data.results) {
+            return;
+        }
+        data.results.forEach(result => {
+            this.updateUI(result);
+            this.addToHistory(result);
+        });
+    }
+    
+    stopStreaming(flush = true) {
+        if (this.streamProcessor) {
+            this.streamProcessor.onaudioprocess = null;
+            this.streamProcessor.disconnect();
+        }
+        if (this.streamSource) {
+            this.streamSource.disconnect();
+        }
+        if (this.audioContext) {
+            this.audioContext.close();
+        }
+        if (flush && this.streamSession) {
+            this.sendStreamRequest(`/api/stream/${this.streamSession}/end`, null);
+        }
+        
+        this.streamProcessor = null;
+        this.streamSource = null;
+        this.audioContext = null;
+        this.streamSession = null;
+    }
+    
     stopRecording() {
         if (this.mediaRecorder && this.mediaRecorder.state !== 'inactive') {
             this.mediaRecorder.stop();
+        } else if (this.stream) {
+            this.stream.getTracks().forEach(track => track.stop());
         }
         
+        if (this.streamSession) {
+            this.stopStreaming();
+        }
+        this.mediaRecorder = null;
+        this.stream = null;
+        
         if (this.recognition) {
             this.recognition.stop();
         }
@@ -152,7 +261,8 @@ class VoiceControl {
     async sendAudioToServer(audioBlob) {
         try {
             const formData = new FormData();
-            formData.append('audio', audioBlob, 'recording.wav');
+            const extension = (audioBlob.type.split('/')[1] || 'webm').split(';')[0];
+            formData.append('audio', audioBlob, `recording.${extension}`);
             
             // Show loading state
             this.recognizedText.textContent = 'Processing...';
@@ -165,6 +275,15 @@ class VoiceControl {
                 body: formData
             });
             
+            if (response.status === 429) {
+                const wait = response.headers.get('Retry-After') || '1';
+                this.showNotification(`Server busy, try again in ${wait}s`, 'error');
+                this.recognizedText.textContent = '-';
+                this.arduinoCommand.textContent = '-';
+                this.robotResponse.textContent = '-';
+                return;
+            }
+            
             if (!response.ok) {
                 throw new Error('Server error');
             }
@@ -318,7 +437,12 @@ class VoiceControl {
             },
             body: JSON.stringify({ text: text })
         })
-        .then(response => response.json())
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Server error');
+            }
+            return response.json();
+        })
         .then(data => {
             this.updateUI(data);
             this.addToHistory(data);
@@ -326,6 +450,8 @@ class VoiceControl {
         .catch(error => {
             console.error('Error:', error);
             this.showNotification('Error processing text command', 'error');
+            this.arduinoCommand.textContent = '-';
+            this.robotResponse.textContent = '-';
         });
     }
     
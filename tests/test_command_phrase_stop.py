@@ -0,0 +1,82 @@
+"""
+CommandPhraseStop must only end generation at a word boundary.
+Run from the repository root: python -m pytest -q
+"""
+
+import pytest
+import torch
+
+import web_interface
+from web_interface import CommandPhraseStop
+
+EOS = 0
+
+
+class PieceTokenizer:
+    """Byte-level-BPE-like stand-in: each id decodes to a fixed piece"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def batch_decode(self, ids, skip_special_tokens=True):
+        return ["".join(self.pieces[i] for i in row.tolist() if not (skip_special_tokens and i == EOS))
+                for row in ids]
+
+
+def first_stop(pieces, phrases, labels):
+    """Feed pieces one token at a time; return the decoded text when the criterion fires"""
+    vocab = [""] + pieces
+    stop = CommandPhraseStop(PieceTokenizer(vocab), phrases, labels)
+    for step in range(1, len(vocab)):
+        ids = torch.arange(1, step + 1).unsqueeze(0)
+        if vocab[step] == "<eos>":
+            ids[0, -1] = EOS
+        if stop(ids, None)[0]:
+            return "".join(vocab[1:step + 1]).replace("<eos>", "")
+    return None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def shutdown():
+    yield
+    # Log the shutdown while pytest's captured stdout is still open
+    web_interface.cleanup()
+
+
+PHRASES = ["bel", "belok kiri", "belok kanan", "maju", "maju robot", "mundur", "mundurin",
+           "nyalakan lampu", "nyalakan lampu merah"]
+LABELS = ["beep", "move_left", "move_right", "move_forward", "move_forward", "move_backward",
+          "move_backward", "light_on", "red_light_on"]
+
+
+def test_subword_continuation_does_not_stop():
+    # " bel" + "ok" is the start of "belok", not the beep command
+    assert first_stop([" bel", "ok", " kiri", "."], PHRASES, LABELS) == " belok kiri."
+    assert first_stop([" bel", "ok"], PHRASES, LABELS) is None
+
+
+def test_stops_after_punctuation():
+    assert first_stop([" bel", ".", " bel"], PHRASES, LABELS) == " bel."
+
+
+def test_stops_at_eos():
+    assert first_stop([" mundur", "<eos>"], PHRASES, LABELS) == " mundur"
+
+
+def test_stops_at_next_word_with_same_meaning():
+    assert first_stop([" maj", "u", " robot", "."], PHRASES, LABELS) == " maju robot"
+
+
+def test_waits_for_longer_phrase_with_other_meaning():
+    assert first_stop([" nyalakan", " lampu", " merah", "."], PHRASES, LABELS) == " nyalakan lampu merah."
+
+
+def test_split_multibyte_character_is_not_a_boundary():
+    assert first_stop([" bel", "�", "�"], PHRASES, LABELS) is None
+
+
+def test_batch_rows_are_independent():
+    vocab = ["", " bel", "ok", "."]
+    stop = CommandPhraseStop(PieceTokenizer(vocab), PHRASES, LABELS)
+    ids = torch.tensor([[1, 2], [1, 3]])
+    assert stop(ids, None).tolist() == [False, True]
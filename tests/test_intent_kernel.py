@@ -0,0 +1,48 @@
+"""
+IntentKernel must reproduce the scikit-learn pipeline it was built from.
+Run from the repository root: python -m pytest -q
+"""
+
+import numpy as np
+import pytest
+
+from ml_ai import IntentKernel, MLRobotAI
+
+
+@pytest.fixture(scope="module")
+def trained():
+    ai = MLRobotAI()
+    ai.train(save_model=False)
+    texts, _ = ai.create_training_data()
+    return ai, texts
+
+
+def test_classes_follow_pipeline(trained):
+    ai, _ = trained
+    assert list(ai.kernel.classes) == list(ai.pipeline.classes_)
+
+
+def test_kernel_matches_pipeline(trained):
+    ai, texts = trained
+    expected = ai.pipeline.predict_proba(texts)
+    single = np.array([ai.kernel.predict_proba(text) for text in texts])
+    np.testing.assert_allclose(single, expected, rtol=0, atol=1e-12)
+
+
+def test_batch_matches_pipeline(trained):
+    ai, texts = trained
+    expected = ai.pipeline.predict_proba(texts)
+    np.testing.assert_allclose(ai.kernel.predict_proba_batch(texts), expected, rtol=0, atol=1e-12)
+
+
+def test_unseen_text_matches_pipeline(trained):
+    ai, _ = trained
+    texts = ["", "xyz qwerty", "tolong nyalakan lampu merah sekarang", "MAJU!!"]
+    kernel = IntentKernel.from_pipeline(ai.pipeline)
+    np.testing.assert_allclose(kernel.predict_proba_batch(texts), ai.pipeline.predict_proba(texts),
+                               rtol=0, atol=1e-12)
+
+
+def test_check_kernel(trained):
+    ai, _ = trained
+    assert ai.check_kernel() < 1e-12
@@ -2,60 +2,742 @@
 web_interface.py - Voice Controlled Robot Web Interface (FIXED)
 """
 
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory
 from flask_cors import CORS
 import os
+import sys
 import time
-import traceback
+import json
+import logging
+import logging.handlers
+import contextvars
 import io
-import wave
+import re
+import math
+import struct
+import queue
+import threading
+import uuid
+import functools
+import itertools
+import bisect
+import atexit
+import multiprocessing
+import sqlite3
+from multiprocessing import shared_memory
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
 import numpy as np
-import torch
-import torch.nn.functional as F
-from transformers import (
-    WhisperProcessor,
-    WhisperForConditionalGeneration,
-    AutoTokenizer,
-    AutoModelForSequenceClassification,
-)
+# torch/transformers take seconds to import; SpeechToText imports them
+# lazily so the server can bind its port first
 import serial
 import serial.tools.list_ports
-from typing import Optional
-
-# Import ML AI module
-from ml_ai import MLRobotAI
+from typing import Optional, List, Tuple, Dict, Iterable, Callable
 
 # ============================================================
 # CONFIGURATION
 # ============================================================
 class Config:
     # Serial settings
-    SERIAL_PORT = os.getenv('SERIAL_PORT', 'COM3')  # Use env variable
+    SERIAL_PORT = os.getenv('SERIAL_PORT', 'COM3')  # Use env variable ('auto' = detect all boards)
+    SERIAL_PORTS = [p.strip() for p in os.getenv('SERIAL_PORTS', '').split(',') if p.strip()]  # Multi-robot
     BAUD_RATE = 9600
     SERIAL_TIMEOUT = 2
+    SERIAL_RX_BUFFER = 64  # Arduino hardware RX buffer; caps bytes in flight
+    COMMAND_COALESCE_MS = float(os.getenv('COMMAND_COALESCE_MS', '500'))  # Repeats within this share one send (0 = off)
+    COMMAND_MAX_BACKLOG_S = float(os.getenv('COMMAND_MAX_BACKLOG_S', '10'))  # Queued motion/sound seconds per robot
+    
+    # Sensor telemetry (TQ/HQ, the firmware's side-effect-free reads, polled in the background)
+    TELEMETRY_INTERVAL = float(os.getenv('TELEMETRY_INTERVAL', '10'))  # Seconds between polls (0 = off)
+    TELEMETRY_MAX_AGE = float(os.getenv('TELEMETRY_MAX_AGE', '30'))  # Serve TR/HR from samples this fresh (0 = never)
+    TELEMETRY_FILE = os.getenv('TELEMETRY_FILE', 'robot_telemetry.npz')  # '' = don't keep across restarts
     
     # Model settings
     WHISPER_MODEL = "openai/whisper-tiny"
     INTENT_MODEL = "microsoft/xtremedistil-l6-h256-uncased"
     
+    # Whisper inference backend: "torch" (fp32), "int8" (dynamic
+    # quantization of Linear layers, CPU) or "onnx" (ONNX Runtime via optimum)
+    STT_BACKEND = os.getenv('STT_BACKEND', 'torch')
+    TORCH_THREADS = int(os.getenv('TORCH_THREADS', '0'))  # 0 = torch default
+    
+    # Command-mode decoding: greedy, forced language/task, token budget
+    # scaled to clip length, early stop on an unambiguous command phrase
+    STT_LANGUAGE = os.getenv('STT_LANGUAGE', '')  # '' = let Whisper detect; e.g. 'id' to force Indonesian
+    STT_TOKENS_PER_SECOND = 6
+    STT_MIN_NEW_TOKENS = 8
+    STT_MAX_NEW_TOKENS = 440  # Whisper's decoder holds 448 positions incl. the prompt
+    STT_EARLY_STOP = os.getenv('STT_EARLY_STOP', '1') == '1'
+    
+    # Whisper micro-batching (1 = disabled)
+    STT_BATCH_SIZE = int(os.getenv('STT_BATCH_SIZE', '8'))
+    STT_BATCH_WINDOW_MS = float(os.getenv('STT_BATCH_WINDOW_MS', '20'))
+    
+    # Whisper inference processes (0 = run in the server process)
+    STT_WORKERS = int(os.getenv('STT_WORKERS', '1'))
+    STT_QUEUE_SIZE = int(os.getenv('STT_QUEUE_SIZE', '32'))  # Waiting clips before answering 429
+    STT_MAX_CLIP_SECONDS = 30  # Whisper's window; longer clips are truncated
+    
     # Server settings
     HOST = '0.0.0.0'
     PORT = 4141
     DEBUG = True
+    READY_WAIT_TIMEOUT = float(os.getenv('READY_WAIT_TIMEOUT', '5'))  # Queue requests this long while warming up
+    INCLUDE_TIMINGS = os.getenv('INCLUDE_TIMINGS', '0') == '1'  # Per-stage timings in responses (or ?timings=1)
+    
+    # Production server (serve.py)
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '8'))  # Concurrent requests per process
+    SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '30'))  # Seconds to drain in-flight requests
+    
+    # Intent model
+    MAX_TEXT_BATCH = int(os.getenv('MAX_TEXT_BATCH', '64'))  # Texts per /api/process_text_batch call
+    MAX_TEXT_LENGTH = 500  # Characters per typed command
+    ML_ONLINE = os.getenv('ML_ONLINE', '0') == '1'  # Learn from /api/feedback without retraining
+    
+    # Server-sent events (/api/events); each open stream holds a server thread
+    SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', str(max(1, SERVER_THREADS // 2))))
+    SSE_QUEUE_SIZE = 64      # Undelivered events before a slow client is dropped
+    SSE_KEEPALIVE = 15       # Seconds between comments on an idle stream
+    SSE_RETRY_MS = 3000      # Browser reconnect delay
+    
+    # Logging (written by a background thread, off the request path)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json'
+    
+    # Audio front end
+    SAMPLE_RATE = 16000                  # Whisper's input rate; uploads are resampled to it
+    
+    # Streaming ingestion / voice-activity detection
+    STREAM_SAMPLE_RATE = SAMPLE_RATE     # Clients send 16-bit mono PCM at this rate
+    STREAM_SESSION_TTL = 60              # Seconds before an idle stream is dropped
+    STREAM_CHUNK_MAX = 256 * 1024        # Bytes per chunk (~8s of PCM); a session is capped at MAX_AUDIO_SIZE
+    VAD_FRAME_MS = 20
+    VAD_ENERGY_THRESHOLD = float(os.getenv('VAD_ENERGY_THRESHOLD', '0.015'))  # RMS, full scale = 1.0
+    VAD_SILENCE_MS = int(os.getenv('VAD_SILENCE_MS', '300'))  # Trailing silence that ends an utterance
+    VAD_MIN_SPEECH_MS = 100
+    VAD_MAX_UTTERANCE_S = 10
     
     # Limits
     MAX_AUDIO_SIZE = 10 * 1024 * 1024  # 10 MB
-    MAX_HISTORY = 10
+    MAX_HISTORY = 10  # Default /api/history page
+    HISTORY_PAGE_MAX = 500
+    HISTORY_RING_SIZE = int(os.getenv('HISTORY_RING_SIZE', '1024'))  # Recent commands kept in memory
+    HISTORY_DB = os.getenv('HISTORY_DB', 'robot_history.db')  # Every command, for auditing ('' = memory only)
+
+# ============================================================
+# LOGGING - Queue-backed, with per-request correlation IDs
+# ============================================================
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request's correlation ID"""
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Request threads only enqueue records; a listener thread formats
+    and writes them, so a slow stdout pipe never blocks a request.
+    """
+    if Config.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)-7s [%(request_id)s] %(message)s", "%H:%M:%S")
+    
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), stream, respect_handler_level=False)
+    
+    handler = logging.handlers.QueueHandler(listener.queue)
+    handler.addFilter(RequestIdFilter())
+    
+    logger = logging.getLogger("robot")
+    logger.handlers[:] = [handler]
+    logger.setLevel(Config.LOG_LEVEL)
+    logger.propagate = False
+    
+    listener.start()
+    return listener
+
+def _reset_logging_after_fork():
+    # The parent's writer thread doesn't exist in the child, but its
+    # listener still looks started (3.12+ refuses to start it again)
+    global log_listener
+    log_listener = setup_logging()
+
+log_listener = setup_logging()
+if hasattr(os, "register_at_fork"):
+    # A forked child (e.g. a gunicorn worker) needs its own writer thread
+    os.register_at_fork(after_in_child=_reset_logging_after_fork)
+log = logging.getLogger("robot")
+
+# ============================================================
+# METRICS - Stage latency histograms (Prometheus text format)
+# ============================================================
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and three adds"""
+    
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {total}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+        return lines
+
+class Metrics:
+    """
+    Per-stage timing histograms. Stages observed on a request thread
+    are also collected into that request's timings dict.
+    """
+    
+    STAGES = ("upload_read", "audio_decode", "feature_extraction", "whisper_generate",
+              "intent_classification", "serial_round_trip", "request_total")
+    
+    def __init__(self):
+        self.stages = {stage: Histogram() for stage in self.STAGES}
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+        
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 3)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @contextmanager
+    def request(self, endpoint: str):
+        """Collect per-stage timings (ms) for the current request"""
+        timings = {}
+        self._local.timings = timings
+        start = time.perf_counter()
+        try:
+            yield timings
+        finally:
+            self.observe("request_total", time.perf_counter() - start)
+            self._local.timings = None
+            with self._lock:
+                self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP robot_stage_duration_seconds Time spent in each pipeline stage",
+            "# TYPE robot_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in list(self.stages.items()):
+            lines.extend(histogram.render("robot_stage_duration_seconds", f'stage="{stage}"'))
+        
+        lines.append("# HELP robot_requests_total Requests handled per endpoint")
+        lines.append("# TYPE robot_requests_total counter")
+        with self._lock:
+            for endpoint, count in self.requests.items():
+                lines.append(f'robot_requests_total{{endpoint="{endpoint}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# ============================================================
+# EVENTS - Server-sent events fan-out
+# ============================================================
+class EventBroadcaster:
+    """
+    Fans events out to /api/events subscribers. Each event is
+    serialized once and the same bytes are queued for every client;
+    a client that falls SSE_QUEUE_SIZE events behind is dropped (its
+    browser reconnects and gets a fresh snapshot).
+    """
+    
+    def __init__(self, max_clients: int, queue_size: int):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self.seq = 0
+        self.closed = False
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def format(event: str, data, seq: Optional[int] = None) -> bytes:
+        lines = [f"event: {event}"]
+        if seq is not None:
+            lines.append(f"id: {seq}")
+        lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+    
+    def subscribe(self) -> Optional[queue.Queue]:
+        """A queue of encoded events, or None when full or shutting down"""
+        with self._lock:
+            if self.closed or len(self._subscribers) >= self.max_clients:
+                return None
+            subscriber = queue.Queue(self.queue_size)
+            self._subscribers.append(subscriber)
+            return subscriber
+    
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+    
+    def publish(self, event: str, data):
+        with self._lock:
+            self.seq += 1
+            if not self._subscribers:
+                return
+            chunk = self.format(event, data, self.seq)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(chunk)
+                except queue.Full:
+                    log.warning("⚠️ Dropping slow event subscriber")
+                    self._subscribers.remove(subscriber)
+                    self._end(subscriber)
+    
+    def close(self):
+        """End every stream, e.g. so a graceful shutdown isn't held open"""
+        with self._lock:
+            self.closed = True
+            subscribers, self._subscribers = self._subscribers, []
+        for subscriber in subscribers:
+            self._end(subscriber)
+    
+    @staticmethod
+    def _end(subscriber: queue.Queue):
+        # Make room for the end-of-stream marker
+        while True:
+            try:
+                subscriber.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    @property
+    def clients(self) -> int:
+        return len(self._subscribers)
+    
+    @property
+    def full(self) -> bool:
+        return self.closed or len(self._subscribers) >= self.max_clients
+
+events = EventBroadcaster(Config.SSE_MAX_CLIENTS, Config.SSE_QUEUE_SIZE)
+
+# ============================================================
+# SERIAL TRANSPORT - Pipelined command I/O
+# ============================================================
+class ReplyLost(Exception):
+    """Raised for a command whose reply never came or was wiped out by a board reset"""
+
+
+class SerialTransport:
+    """
+    Owns one serial port. A writer thread drains the command queue
+    and a reader thread matches each reply line to the oldest pending
+    command (the firmware answers strictly in order), so callers never
+    share the port and commands can be pipelined up to the size of the
+    Arduino's RX buffer.
+    
+    Replies carry no id, so the FIFO is kept in step with the board:
+    each pending command gets a deadline (queued ahead of it + its own
+    blocking time + SERIAL_TIMEOUT) and is dropped once it passes, and
+    a READY or CRITICAL line (the board reset) drops everything.
+    """
+    
+    RESPONSE_PREFIXES = ("OK", "ERROR", "TEMP:", "HUMID:", "PONG")
+    RESET_PREFIXES = ("READY", "CRITICAL")
+    
+    def __init__(self, ser, rx_buffer: int = None, on_error=None):
+        self.ser = ser
+        self.rx_buffer = rx_buffer or Config.SERIAL_RX_BUFFER
+        self.on_error = on_error
+        
+        self._queue = queue.Queue()
+        self._pending = deque()  # (future, bytes, reply deadline) in send order
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        
+        self._writer = threading.Thread(target=self._write_loop, name="serial-writer", daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, name="serial-reader", daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    def submit(self, command: str, seconds: float = 0.0) -> Future:
+        """Queue a command; the future resolves to the firmware's reply line.
+        `seconds` is how long the firmware blocks on it (CommandScheduler.estimate)."""
+        future = Future()
+        if self._closed:
+            future.set_exception(serial.SerialException("Serial transport closed"))
+        else:
+            self._queue.put((command, future, seconds))
+        return future
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            command, future, seconds = item
+            line = (command + "\n").encode()
+            
+            with self._cond:
+                # Don't overrun the Arduino's RX buffer
+                while self._pending and self._in_flight + len(line) > self.rx_buffer and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    future.set_exception(serial.SerialException("Serial transport closed"))
+                    continue
+                # The board gets to it after everything ahead of it
+                start = max(time.monotonic(), self._pending[-1][2] if self._pending else 0.0)
+                self._pending.append((future, len(line), start + seconds + Config.SERIAL_TIMEOUT))
+                self._in_flight += len(line)
+            
+            try:
+                self.ser.write(line)
+            except Exception as e:
+                self._fail(e)
+
+    def _read_loop(self):
+        while not self._closed:
+            try:
+                raw = self.ser.readline()
+            except Exception as e:
+                if not self._closed:
+                    self._fail(e)
+                break
+            
+            self._drop_pending(expired_only=True)
+            
+            line = raw.decode(errors="ignore").strip()
+            if not line:
+                continue
+            
+            if not line.startswith(self.RESPONSE_PREFIXES):
+                log.info("[Arduino] %s", line)
+                if line.startswith(self.RESET_PREFIXES):
+                    # The board restarted; whatever it had queued is gone
+                    self._drop_pending(expired_only=False)
+                continue
+            
+            future = None
+            with self._cond:
+                if self._pending:
+                    future, size, _ = self._pending.popleft()
+                    self._in_flight -= size
+                    self._cond.notify_all()
+            
+            if future is None:
+                log.warning("[Arduino] Unsolicited reply: %s", line)
+            elif not future.done():
+                future.set_result(line)
+
+    def _drop_pending(self, expired_only: bool):
+        """Fail pending commands (only those past their deadline, or all) and free their bytes"""
+        now = time.monotonic()
+        dropped = []
+        with self._cond:
+            while self._pending and (not expired_only or self._pending[0][2] <= now):
+                future, size, _ = self._pending.popleft()
+                self._in_flight -= size
+                dropped.append(future)
+            if dropped:
+                self._cond.notify_all()
+        
+        if not dropped:
+            return
+        reason = "No reply from Arduino" if expired_only else "Arduino reset"
+        log.warning("⚠️ %s; dropped %d pending command(s)", reason, len(dropped))
+        for future in dropped:
+            if not future.done():
+                future.set_exception(ReplyLost(reason))
+
+    def _fail(self, error: Exception, notify: bool = True):
+        """Fail every pending command and stop accepting new ones"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            pending = list(self._pending)
+            self._pending.clear()
+            self._in_flight = 0
+            self._cond.notify_all()
+        
+        for future, _, _ in pending:
+            if not future.done():
+                future.set_exception(error)
+        
+        self._queue.put(None)
+        if notify and self.on_error:
+            self.on_error(error)
+
+    def close(self):
+        """Stop both threads; pending commands are failed"""
+        self._fail(serial.SerialException("Serial transport closed"), notify=False)
+        self._writer.join(timeout=2)
+
+# ============================================================
+# COMMAND SCHEDULER - Coalescing, stop preemption and pacing
+# ============================================================
+class CommandScheduler:
+    """
+    Sits between RobotController and SerialTransport. The firmware
+    handles one line at a time and blocks in delay() for motion, sound
+    and timed LED commands, so:
+    
+    - a command identical to the last one queued (or, with nothing
+      queued, the last one sent within COMMAND_COALESCE_MS) shares its
+      send and reply; anything in between breaks the run;
+    - at most one blocking command is on the board at a time (the next
+      one waits for its reply, i.e. rate limits follow the durations);
+    - "MS:0:0" (stop) is never merged: it jumps the queue and cancels
+      queued motion, so it runs right after whatever the board is
+      executing now;
+    - queued blocking work per kind is capped at COMMAND_MAX_BACKLOG_S.
+    """
+    
+    STOP = "MS:0:0"
+    
+    def __init__(self, transport: SerialTransport, coalesce_window: float = None, max_backlog: float = None):
+        self.transport = transport
+        self.coalesce_window = Config.COMMAND_COALESCE_MS / 1000 if coalesce_window is None else coalesce_window
+        self.max_backlog = Config.COMMAND_MAX_BACKLOG_S if max_backlog is None else max_backlog
+        
+        self._queue = deque()  # [command, future, kind, seconds]
+        self._last_sent: Optional[Tuple[str, Future, float]] = None  # (command, future, sent at)
+        self._blocking: Optional[Future] = None  # Reply to the blocking command on the board
+        self._blocking_deadline = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.counts = {"sent": 0, "coalesced": 0, "preempted": 0, "rejected": 0}
+        
+        self._thread = threading.Thread(target=self._dispatch_loop, name="command-scheduler", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def estimate(command: str) -> Tuple[str, float]:
+        """(kind, seconds the firmware blocks for) following robot.ino's parsing"""
+        kind = command[:1]
+        try:
+            if kind == "M":
+                if command[1:2] == "S":
+                    return "stop", 0.0
+                parts = command[3:].split(":")
+                degrees = int(parts[0])
+                repeat = int(parts[1]) if len(parts) > 1 else 1
+                degrees = degrees if 0 <= degrees <= 360 else 90
+                repeat = repeat if 0 <= repeat <= 10 else 1
+                return "motion", repeat * (degrees / 360 + 0.5)  # Each turn + SHORT_DELAY
+            if kind == "S":
+                tones = [tone.split(":") for tone in command[1:].split(";")[:10]]
+                return "sound", float(sum(min(int(t[1]), 10) for t in tones if len(t) > 1))
+            if kind == "L":
+                parts = command[1:].split(";")[0].split(":")
+                state = int(parts[1])
+                duration = int(parts[2]) if len(parts) > 2 else 0
+                if state == 1:
+                    return "light", float(duration)
+                if state == 2:
+                    return "light", (duration * 2 if duration > 0 else 10) * 0.5  # BLINK_DELAY on + off
+                return "light", 0.0
+        except (ValueError, IndexError):
+            pass  # The firmware rejects it quickly
+        if kind in ("T", "H"):
+            return "sensor", 0.0
+        return "other", 0.0
+
+    def submit(self, command: str) -> Future:
+        """Schedule a command; the future resolves to the firmware's reply line"""
+        kind, seconds = self.estimate(command)
+        now = time.monotonic()
+        
+        with self._cond:
+            if self._closed:
+                future = Future()
+                future.set_exception(serial.SerialException("Serial transport closed"))
+                return future
+            
+            merged = self._mergeable(command, now)
+            if merged is not None:
+                self.counts["coalesced"] += 1
+                return merged
+            
+            future = Future()
+            if command == self.STOP:
+                self._preempt_motion()
+                self._queue.appendleft([command, future, kind, seconds])
+            else:
+                backlog = sum(item[3] for item in self._queue if item[2] == kind)
+                if seconds and backlog and backlog + seconds > self.max_backlog:
+                    self.counts["rejected"] += 1
+                    future.set_result(f"BUSY: {kind} queue full")
+                    return future
+                self._queue.append([command, future, kind, seconds])
+            
+            self._cond.notify_all()
+        return future
+
+    def _mergeable(self, command: str, now: float) -> Optional[Future]:
+        """The future of an identical, immediately preceding command; the caller holds the lock"""
+        if command == self.STOP or self.coalesce_window <= 0:
+            return None
+        if self._queue:
+            tail = self._queue[-1]
+            return tail[1] if tail[0] == command else None
+        if self._last_sent and self._last_sent[0] == command:
+            _, future, sent_at = self._last_sent
+            if not future.done() or now - sent_at < self.coalesce_window:
+                return future
+        return None
+
+    def is_queued(self, future: Future) -> bool:
+        """True while the command behind `future` has not been sent yet"""
+        with self._cond:
+            return any(item[1] is future for item in self._queue)
+
+    def _preempt_motion(self):
+        """Drop queued motion; the caller holds the lock"""
+        kept = deque()
+        for item in self._queue:
+            if item[2] == "motion":
+                item[1].set_result("SKIPPED: stop requested")
+                self.counts["preempted"] += 1
+            else:
+                kept.append(item)
+        self._queue = kept
+
+    def _may_send(self, item) -> bool:
+        if not item[3] or self._blocking is None:
+            return True
+        return self._blocking.done() or time.monotonic() >= self._blocking_deadline
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and not (self._queue and self._may_send(self._queue[0])):
+                    # A lost reply must not stall the queue forever
+                    timeout = max(0.0, self._blocking_deadline - time.monotonic()) if self._queue else None
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+                command, future, kind, seconds = self._queue.popleft()
+                self._last_sent = (command, future, time.monotonic())
+                self.counts["sent"] += 1
+            
+            reply = self.transport.submit(command, seconds)
+            if seconds:
+                with self._cond:
+                    self._blocking = reply
+                    self._blocking_deadline = time.monotonic() + seconds + Config.SERIAL_TIMEOUT
+                reply.add_done_callback(self._on_reply)
+            reply.add_done_callback(functools.partial(self._resolve, future))
+
+    def _on_reply(self, _reply: Future):
+        with self._cond:
+            self._cond.notify_all()
+
+    @staticmethod
+    def _resolve(future: Future, reply: Future):
+        error = reply.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(reply.result())
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self.counts, queued=len(self._queue))
+
+    def close(self):
+        """Stop dispatching; queued commands are failed"""
+        with self._cond:
+            self._closed = True
+            queued, self._queue = list(self._queue), deque()
+            self._cond.notify_all()
+        for _, future, _, _ in queued:
+            future.set_exception(serial.SerialException("Serial transport closed"))
 
 # ============================================================
 # ROBOT CONTROLLER
 # ============================================================
+ARDUINO_IDS = {
+    (0x2341, 0x0043), (0x2341, 0x0001), (0x2A03, 0x0043),
+    (0x2341, 0x0010), (0x2A03, 0x0010), (0x2341, 0x8036),
+    (0x2341, 0x0036), (0x2A03, 0x8036),
+}
+
+def detect_arduino_ports() -> List[str]:
+    """Return every serial port whose VID/PID looks like an Arduino"""
+    ports = []
+    for port in serial.tools.list_ports.comports():
+        if hasattr(port, 'vid') and hasattr(port, 'pid'):
+            if (port.vid, port.pid) in ARDUINO_IDS:
+                log.info("🔍 Found Arduino on %s", port.device)
+                ports.append(port.device)
+    return sorted(ports)
+
 class RobotController:
-    def __init__(self, port: Optional[str], baud_rate: int):
+    def __init__(self, port: Optional[str], baud_rate: int, on_change: Optional[Callable[[], None]] = None):
         self.port = port
         self.baud_rate = baud_rate
+        self.on_change = on_change  # Called when the connection drops
         self.arduino = None
+        self.transport = None
+        self.scheduler = None
+        self.telemetry = SensorTelemetry()
         self.connected = False
         self.error = None
         
@@ -66,22 +748,12 @@ class RobotController:
             if detected_port:
                 self.connect(detected_port)
             else:
-                print("⚠️ Arduino not found. Running in SIMULATION mode.")
+                log.warning("⚠️ Arduino not found. Running in SIMULATION mode.")
 
     def _auto_detect_arduino(self):
         """Auto-detect Arduino on available COM ports"""
-        ARDUINO_IDS = {
-            (0x2341, 0x0043), (0x2341, 0x0001), (0x2A03, 0x0043),
-            (0x2341, 0x0010), (0x2A03, 0x0010), (0x2341, 0x8036),
-            (0x2341, 0x0036), (0x2A03, 0x8036),
-        }
-        
-        for port in serial.tools.list_ports.comports():
-            if hasattr(port, 'vid') and hasattr(port, 'pid'):
-                if (port.vid, port.pid) in ARDUINO_IDS:
-                    print(f"🔍 Found Arduino on {port.device}")
-                    return port.device
-        return None
+        ports = detect_arduino_ports()
+        return ports[0] if ports else None
 
     def connect(self, port: str) -> bool:
         """Connect to Arduino"""
@@ -92,15 +764,17 @@ class RobotController:
                 timeout=Config.SERIAL_TIMEOUT
             )
             time.sleep(2)  # Wait for Arduino to initialize
+            self.transport = SerialTransport(self.arduino, on_error=self._on_serial_error)
+            self.scheduler = CommandScheduler(self.transport)
             self.connected = True
             self.port = port
             self.error = None
-            print(f"✅ Connected to Arduino on {port}")
+            log.info("✅ Connected to Arduino on %s", port)
             return True
         except Exception as e:
             self.connected = False
             self.error = str(e)
-            print(f"⚠️ Arduino connection failed: {self.error}")
+            log.warning("⚠️ Arduino connection failed: %s", self.error)
             return False
 
     def send_command(self, command: str) -> str:
@@ -109,150 +783,1240 @@ class RobotController:
             return "EMPTY_COMMAND"
         
         if not self.connected:
-            print(f"[SIMULATION] Command => {command}")
+            log.debug("[SIMULATION] Command => %s", command)
             return f"[SIMULASI] Perintah diterima: {command}"
         
+        # Sensor reads come from the poller's samples while they're fresh
+        cached = self.telemetry.cached_reply(command, Config.TELEMETRY_MAX_AGE)
+        if cached:
+            return cached
+        
+        start = time.perf_counter()
+        future = self.scheduler.submit(command)
+        try:
+            response = future.result(timeout=Config.SERIAL_TIMEOUT)
+            metrics.observe("serial_round_trip", time.perf_counter() - start)
+            self.telemetry.record_reply(command, response)
+            return response if response else "OK"
+        except FutureTimeout:
+            if self.scheduler.is_queued(future):
+                # Still waiting behind other motion/sound; it will be sent
+                return "QUEUED"
+            # No reply yet (long sound/motion); the reply is still matched
+            # to this command when it arrives, keeping the queue in order
+            return "OK"
+        except ReplyLost as e:
+            log.warning("⚠️ %s: %s", command, e)
+            return "ERROR"
+        except Exception as e:
+            self._on_serial_error(e)
+            return "ERROR"
+
+    def refresh_sensors(self) -> bool:
+        """Read TQ and HQ from the board into the telemetry series; False if neither worked"""
+        recorded = False
+        for command in SensorTelemetry.POLL_COMMANDS:
+            try:
+                reply = self.scheduler.submit(command).result(timeout=Config.SERIAL_TIMEOUT)
+            except Exception as e:
+                log.debug("🌡️ %s poll failed on %s: %s", command, self.port, e)
+                continue
+            if self.telemetry.record_reply(command, reply):
+                recorded = True
+            else:
+                log.debug("🌡️ %s poll on %s: %s", command, self.port, reply)
+        return recorded
+
+    def _on_serial_error(self, error: Exception):
+        """Called by the transport when the port fails"""
+        if self.scheduler:
+            self.scheduler.close()
+        if self.connected:
+            self.connected = False
+            self.error = str(error)
+            log.error("⚠️ Serial error: %s", error)
+            if self.on_change:
+                self.on_change()
+
+    def disconnect(self):
+        """Disconnect from Arduino"""
+        if self.scheduler:
+            self.scheduler.close()
+            self.scheduler = None
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+        
+        if self.arduino:
+            try:
+                self.arduino.close()
+                self.connected = False
+                log.info("✅ Arduino disconnected")
+            except Exception as e:
+                log.warning("⚠️ Disconnect error: %s", e)
+
+# ============================================================
+# ROBOT POOL - One persistent connection per attached board
+# ============================================================
+class RobotPool:
+    """
+    Routes commands to several Arduinos by robot id ("robot0",
+    "robot1", ... or the port name). Commands in broadcast_commands,
+    or sent to robot id "all", are fanned out to every board in
+    parallel.
+    """
+    
+    BROADCAST_ID = "all"
+    
+    def __init__(self, ports: List[str], baud_rate: int, broadcast_commands: Iterable[str] = (),
+                 on_change: Optional[Callable[[], None]] = None):
+        self.broadcast_commands = frozenset(broadcast_commands)
+        self.robots: Dict[str, RobotController] = {}
+        
+        if ports:
+            # Each connect waits for the board to reset, so open them together
+            with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+                controllers = list(executor.map(lambda p: RobotController(p, baud_rate, on_change), ports))
+        else:
+            controllers = [RobotController(port=None, baud_rate=baud_rate, on_change=on_change)]
+        
+        for i, controller in enumerate(controllers):
+            self.robots[f"robot{i}"] = controller
+        
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.robots)), thread_name_prefix="robot-pool")
+
+    @classmethod
+    def from_config(cls, broadcast_commands: Iterable[str] = (),
+                    on_change: Optional[Callable[[], None]] = None) -> "RobotPool":
+        """SERIAL_PORTS, else SERIAL_PORT, else every detected board"""
+        if Config.SERIAL_PORTS:
+            ports = Config.SERIAL_PORTS
+        elif Config.SERIAL_PORT and Config.SERIAL_PORT != 'auto':
+            ports = [Config.SERIAL_PORT]
+        else:
+            ports = detect_arduino_ports()
+        return cls(ports, Config.BAUD_RATE, broadcast_commands, on_change)
+
+    @property
+    def default(self) -> RobotController:
+        return next(iter(self.robots.values()))
+
+    # The default robot's state keeps single-robot callers working
+    @property
+    def connected(self) -> bool:
+        return self.default.connected
+
+    @property
+    def port(self) -> Optional[str]:
+        return self.default.port
+
+    @property
+    def error(self) -> Optional[str]:
+        return self.default.error
+
+    def has(self, robot_id: str) -> bool:
+        return robot_id == self.BROADCAST_ID or self.get(robot_id) is not None
+
+    def get(self, robot_id: Optional[str]) -> Optional[RobotController]:
+        """Look up a robot by id or port name (None = default robot)"""
+        if not robot_id:
+            return self.default
+        if robot_id in self.robots:
+            return self.robots[robot_id]
+        for controller in self.robots.values():
+            if controller.port == robot_id:
+                return controller
+        return None
+
+    def send_command(self, command: str, robot_id: Optional[str] = None) -> str:
+        """Send to one robot, or to all of them for broadcast commands"""
+        broadcast = robot_id == self.BROADCAST_ID or (not robot_id and command in self.broadcast_commands)
+        if broadcast and len(self.robots) > 1:
+            responses = self.broadcast(command)
+            return "; ".join(f"{rid}: {resp}" for rid, resp in responses.items())
+        
+        controller = self.get(None if robot_id == self.BROADCAST_ID else robot_id)
+        if controller is None:
+            return f"ERROR: Unknown robot {robot_id}"
+        return controller.send_command(command)
+
+    def broadcast(self, command: str) -> Dict[str, str]:
+        """Send a command to every robot in parallel"""
+        futures = {
+            robot_id: self._executor.submit(controller.send_command, command)
+            for robot_id, controller in self.robots.items()
+        }
+        return {robot_id: future.result() for robot_id, future in futures.items()}
+
+    def status(self) -> List[dict]:
+        return [
+            {"id": robot_id, "port": c.port, "connected": c.connected, "error": c.error,
+             "scheduler": c.scheduler.stats() if c.scheduler else None}
+            for robot_id, c in self.robots.items()
+        ]
+
+    def disconnect(self):
+        for controller in self.robots.values():
+            controller.disconnect()
+        self._executor.shutdown(wait=False)
+
+# ============================================================
+# TELEMETRY - Background sensor polling and time series
+# ============================================================
+class RollupSeries:
+    """
+    Fixed-capacity ring of time buckets in NumPy arrays: start time,
+    count, sum, min and max per bucket. bucket=0 keeps raw samples.
+    """
+    
+    FIELDS = ("ts", "count", "sum", "min", "max")
+    
+    def __init__(self, bucket: float, capacity: int):
+        self.bucket = bucket
+        self.capacity = capacity
+        self.ts = np.full(capacity, np.nan)
+        self.count = np.zeros(capacity, dtype=np.uint32)
+        self.sum = np.zeros(capacity, dtype=np.float32)
+        self.min = np.zeros(capacity, dtype=np.float32)
+        self.max = np.zeros(capacity, dtype=np.float32)
+        self.n = 0  # Buckets ever opened
+
+    def add(self, ts: float, value: float):
+        start = ts - ts % self.bucket if self.bucket else ts
+        i = (self.n - 1) % self.capacity
+        if self.bucket and self.n and start <= self.ts[i]:
+            # Same bucket (or a sample that arrived a little late)
+            self.count[i] += 1
+            self.sum[i] += value
+            self.min[i] = min(self.min[i], value)
+            self.max[i] = max(self.max[i], value)
+            return
+        
+        i = self.n % self.capacity
+        self.ts[i] = start
+        self.count[i] = 1
+        self.sum[i] = self.min[i] = self.max[i] = value
+        self.n += 1
+
+    def covers(self, since: float) -> bool:
+        """True if nothing at or after `since` has been overwritten"""
+        return self.n <= self.capacity or self.ts[self.n % self.capacity] <= since
+
+    def range(self, since: float, until: float) -> List[list]:
+        """[[ts, mean, min, max], ...] for buckets starting in [since, until), oldest first"""
+        size = min(self.n, self.capacity)
+        order = np.arange(self.n - size, self.n) % self.capacity
+        ts = self.ts[order]
+        order = order[(ts >= since) & (ts < until)]
+        mean = self.sum[order] / self.count[order]
+        return np.round(np.column_stack([self.ts[order], mean, self.min[order], self.max[order]]), 3).tolist()
+
+class SensorTelemetry:
+    """
+    Temperature and humidity samples for one robot, at raw, 1-minute
+    and 1-hour resolution, plus the latest value for serving TR/HR
+    from cache.
+    """
+    
+    COMMANDS = {
+        "TR": ("temperature", "TEMP:"), "HR": ("humidity", "HUMID:"),
+        # Quiet reads: same replies, without TR/HR's LCD and LED side effects
+        "TQ": ("temperature", "TEMP:"), "HQ": ("humidity", "HUMID:"),
+    }
+    POLL_COMMANDS = ("TQ", "HQ")
+    RESOLUTIONS = {"raw": (0, 8640), "1m": (60, 7 * 24 * 60), "1h": (3600, 366 * 24)}  # (bucket s, buckets kept)
+    
+    def __init__(self):
+        self.series = {
+            metric: {name: RollupSeries(bucket, capacity) for name, (bucket, capacity) in self.RESOLUTIONS.items()}
+            for metric, _ in self.COMMANDS.values()
+        }
+        self.latest: Dict[str, Tuple[float, float]] = {}  # metric -> (ts, value)
+        self._lock = threading.Lock()
+
+    def record_reply(self, command: str, reply: str, ts: float = None) -> bool:
+        """Store a TEMP:/HUMID: reply line; False if it isn't one"""
+        metric, prefix = self.COMMANDS.get(command, (None, None))
+        if metric is None or not reply.startswith(prefix):
+            return False
+        try:
+            value = float(reply[len(prefix):])
+        except ValueError:
+            return False
+        
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for series in self.series[metric].values():
+                series.add(ts, value)
+            self.latest[metric] = (ts, value)
+        return True
+
+    def cached_reply(self, command: str, max_age: float) -> Optional[str]:
+        """The firmware's reply line from a sample at most max_age seconds old"""
+        metric, prefix = self.COMMANDS.get(command, (None, None))
+        latest = self.latest.get(metric)
+        if latest is None or max_age <= 0 or time.time() - latest[0] > max_age:
+            return None
+        return f"{prefix}{latest[1]:.1f}"
+
+    def query(self, metric: str, since: float, until: float,
+              resolution: str = "auto", max_points: int = 500) -> Tuple[str, List[list]]:
+        """
+        (resolution, points) for [since, until). "auto" picks the finest
+        resolution that still holds `since` and fits in max_points.
+        """
+        with self._lock:
+            if resolution != "auto":
+                return resolution, self.series[metric][resolution].range(since, until)
+            for name in self.RESOLUTIONS:
+                series = self.series[metric][name]
+                if not series.covers(since):
+                    continue
+                points = series.range(since, until)
+                if len(points) <= max_points:
+                    return name, points
+            name = list(self.RESOLUTIONS)[-1]
+            return name, self.series[metric][name].range(since, until)[-max_points:]
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        with self._lock:
+            arrays = {}
+            for metric, resolutions in self.series.items():
+                for name, series in resolutions.items():
+                    key = f"{prefix}.{metric}.{name}"
+                    arrays[f"{key}.n"] = np.array(series.n)
+                    for field in RollupSeries.FIELDS:
+                        arrays[f"{key}.{field}"] = getattr(series, field)
+            return arrays
+
+    def load_arrays(self, prefix: str, data) -> bool:
+        keys = [(series, f"{prefix}.{metric}.{name}")
+                for metric, resolutions in self.series.items() for name, series in resolutions.items()]
+        if not all(f"{key}.n" in data.files and data[f"{key}.ts"].shape == series.ts.shape for series, key in keys):
+            return False  # Another robot layout or ring size
+        
+        with self._lock:
+            for metric, resolutions in self.series.items():
+                for name, series in resolutions.items():
+                    key = f"{prefix}.{metric}.{name}"
+                    series.n = int(data[f"{key}.n"])
+                    for field in RollupSeries.FIELDS:
+                        setattr(series, field, data[f"{key}.{field}"].astype(getattr(series, field).dtype))
+                raw = resolutions["raw"]
+                if raw.n:
+                    i = (raw.n - 1) % raw.capacity
+                    self.latest[metric] = (float(raw.ts[i]), float(raw.sum[i]))
+        return True
+
+class TelemetryPoller:
+    """
+    Reads TQ and HQ from every connected robot each TELEMETRY_INTERVAL
+    seconds, and saves the series to TELEMETRY_FILE (periodically and on
+    stop) so they survive restarts. A robot whose polls keep failing
+    (older firmware without TQ/HQ, or a dead sensor) is no longer polled.
+    """
+    
+    SAVE_EVERY = 300  # Seconds between saves
+    MAX_FAILURES = 3  # Failed polls in a row before a robot is left alone
+    
+    def __init__(self, pool: "RobotPool", interval: float, path: Optional[str]):
+        self.pool = pool
+        self.interval = interval
+        self.path = path or None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._saved_at = time.monotonic()
+        self._failures: Dict[str, int] = {}
+
+    def start(self):
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+        log.info("🌡️ Polling sensors every %ss", self.interval)
+
+    def _run(self):
+        while True:
+            for robot_id, controller in list(self.pool.robots.items()):
+                failures = self._failures.get(robot_id, 0)
+                if not controller.connected or failures >= self.MAX_FAILURES:
+                    continue
+                failures = 0 if controller.refresh_sensors() else failures + 1
+                self._failures[robot_id] = failures
+                if failures >= self.MAX_FAILURES:
+                    log.warning("⚠️ %d sensor polls in a row failed on %s, no longer polling it "
+                                "(needs robot.ino with TQ/HQ and a working DHT11)", failures, controller.port)
+            if time.monotonic() - self._saved_at > self.SAVE_EVERY:
+                self.save()
+            if self._stop.wait(self.interval):
+                return
+
+    def save(self):
+        self._saved_at = time.monotonic()
+        if self.path is None:
+            return
+        arrays = {}
+        for robot_id, controller in self.pool.robots.items():
+            arrays.update(controller.telemetry.arrays(robot_id))
+        
+        # Write next to the target, then swap, so readers never see half a file
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("⚠️ Could not save telemetry to %s: %s", self.path, e)
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                loaded = [robot_id for robot_id, controller in self.pool.robots.items()
+                          if controller.telemetry.load_arrays(robot_id, data)]
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("⚠️ Telemetry file %s is unreadable: %s", self.path, e)
+            return
+        log.info("🌡️ Telemetry loaded from %s (%s)", self.path, ", ".join(loaded) or "no matching robots")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=Config.SERIAL_TIMEOUT * 2 + 1)
+            self._thread = None
+        self.save()
+
+# ============================================================
+# AUDIO FRONT END - WAV parsing, mixdown and resampling
+# ============================================================
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def parse_wav_header(buf: memoryview) -> Optional[Tuple[int, int, int, int, int, int]]:
+    """
+    Walk the RIFF chunks without copying.
+    Returns (format_tag, channels, sample_rate, bits, data_offset, data_size)
+    """
+    if len(buf) < 12 or buf[0:4] != b'RIFF' or buf[8:12] != b'WAVE':
+        return None
+    
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(buf):
+        chunk_id = buf[offset:offset + 4].tobytes()
+        (size,) = struct.unpack_from('<I', buf, offset + 4)
+        body = offset + 8
+        
+        if chunk_id == b'fmt ' and size >= 16:
+            tag, channels, rate, _, _, bits = struct.unpack_from('<HHIIHH', buf, body)
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                # Real format is the first two bytes of the SubFormat GUID
+                (tag,) = struct.unpack_from('<H', buf, body + 24)
+            # A zero field would otherwise reach a division in decode_wav
+            if channels < 1 or rate < 1 or bits <= 0 or channels * bits // 8 == 0:
+                return None
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            # Streamed WAVs often leave the size as 0 or 0xFFFFFFFF
+            available = len(buf) - body
+            if size == 0 or size > available:
+                size = available
+            return fmt + (body, size)
+        
+        offset = body + size + (size & 1)  # Chunks are word aligned
+    
+    return None
+
+def _int24_to_int32(raw: memoryview) -> np.ndarray:
+    """Packed little-endian 24-bit samples -> int32 scaled by 2**8"""
+    n = len(raw) // 3
+    out = np.empty(n, dtype='<i4')
+    if n == 0:
+        return out
+    # Overlapping 4-byte reads at a 3-byte stride; shifting left drops
+    # the neighbour's byte and leaves the sign bit in place
+    if n > 1:
+        words = np.ndarray((n - 1,), dtype='<i4', buffer=raw, strides=(3,))
+        np.left_shift(words, 8, out=out[:-1])
+    out[-1] = int.from_bytes(raw[3 * (n - 1):3 * n], 'little', signed=True) << 8
+    return out
+
+def _to_mono_float32(samples: np.ndarray, channels: int, scale: float, bias: float = 0.0) -> np.ndarray:
+    """Mix down and convert with a single float32 allocation"""
+    audio = samples[0::channels].astype(np.float32)
+    for channel in range(1, channels):
+        audio += samples[channel::channels]
+    
+    if bias:
+        audio -= bias * channels
+    audio *= scale / channels
+    return audio
+
+def decode_wav(data) -> Optional[Tuple[np.ndarray, int]]:
+    """Decode 8/16/24/32-bit PCM or 32/64-bit float WAV to mono float32"""
+    buf = memoryview(data)
+    header = parse_wav_header(buf)
+    if header is None:
+        return None
+    
+    tag, channels, sr, bits, offset, size = header
+    if channels < 1 or bits % 8:
+        return None
+    
+    frame_bytes = channels * bits // 8
+    raw = buf[offset:offset + (size // frame_bytes) * frame_bytes]
+    
+    if tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(raw, dtype='<f4' if bits == 32 else '<f8')
+        return _to_mono_float32(samples, channels, 1.0), sr
+    
+    if tag != WAVE_FORMAT_PCM:
+        return None
+    
+    if bits == 8:
+        # 8-bit WAV is unsigned with a 128 midpoint
+        samples = np.frombuffer(raw, dtype=np.uint8)
+        return _to_mono_float32(samples, channels, 1.0 / 128, bias=128.0), sr
+    if bits == 16:
+        samples = np.frombuffer(raw, dtype='<i2')
+        return _to_mono_float32(samples, channels, 1.0 / 32768), sr
+    if bits == 24:
+        samples = _int24_to_int32(raw)
+        return _to_mono_float32(samples, channels, 1.0 / 2**31), sr
+    if bits == 32:
+        samples = np.frombuffer(raw, dtype='<i4')
+        return _to_mono_float32(samples, channels, 1.0 / 2**31), sr
+    
+    return None
+
+def resample(audio: np.ndarray, sr: int, target: int = None) -> np.ndarray:
+    """Polyphase resampling to the target rate (no-op when it matches)"""
+    target = target or Config.SAMPLE_RATE
+    if sr == target or not len(audio):
+        return audio
+    
+    from scipy.signal import resample_poly
+    g = math.gcd(sr, target)
+    return resample_poly(audio, target // g, sr // g).astype(np.float32, copy=False)
+
+def detect_container(data) -> Optional[str]:
+    """Identify the upload format from its magic bytes"""
+    head = bytes(data[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return "wav"
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return "webm"  # EBML: WebM / Matroska
+    if head[:4] == b'OggS':
+        return "ogg"
+    if head[:4] == b'fLaC':
+        return "flac"
+    if head[4:8] == b'ftyp':
+        return "mp4"
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+# Uploads that are declared as headerless 16-bit PCM
+RAW_PCM_MIMETYPES = {"audio/l16", "audio/pcm", "audio/x-raw"}
+
+_pyav_missing_reported = False
+
+def decode_compressed(data, target: int = None) -> Optional[np.ndarray]:
+    """
+    Decode WebM/Opus, OGG, FLAC, MP3 or MP4 audio in memory with PyAV
+    (bundled FFmpeg) straight to mono float32 at the target rate.
+    """
+    global _pyav_missing_reported
+    try:
+        import av
+    except ImportError:
+        if not _pyav_missing_reported:
+            log.warning("⚠️ Compressed audio needs PyAV: pip install av")
+            _pyav_missing_reported = True
+        return None
+    
+    target = target or Config.SAMPLE_RATE
+    try:
+        with av.open(io.BytesIO(data), mode="r") as container:
+            stream = next((s for s in container.streams if s.type == "audio"), None)
+            if stream is None:
+                return None
+            
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=target)
+            chunks = []
+            for frame in container.decode(stream):
+                for out in resampler.resample(frame):
+                    chunks.append(out.to_ndarray().reshape(-1))
+            for out in resampler.resample(None):  # Flush
+                chunks.append(out.to_ndarray().reshape(-1))
+    except Exception as e:
+        log.warning("⚠️ Audio decode error: %s", e)
+        return None
+    
+    if not chunks:
+        return None
+    return np.concatenate(chunks).astype(np.float32, copy=False)
+
+def decode_upload(audio_bytes: bytes, mimetype: Optional[str] = None) -> Optional[Tuple[np.ndarray, int]]:
+    """
+    Decode uploaded bytes into (mono float32 array at SAMPLE_RATE, SAMPLE_RATE).
+    Returns None for input that can't be decoded, before any model work.
+    """
+    if not audio_bytes:
+        return None
+    
+    # Check size limit
+    if len(audio_bytes) > Config.MAX_AUDIO_SIZE:
+        log.warning("⚠️ Audio too large: %d bytes", len(audio_bytes))
+        return None
+    
+    container = detect_container(audio_bytes)
+    
+    if container == "wav":
+        try:
+            decoded = decode_wav(audio_bytes)
+        except Exception as e:
+            log.warning("⚠️ WAV parsing error: %s", e)
+            return None
+        if decoded is None:
+            log.warning("⚠️ WAV parsing error: not a supported WAV file")
+            return None
+        audio, sr = decoded
+        return resample(audio, sr), Config.SAMPLE_RATE
+    
+    if container is not None:
+        audio = decode_compressed(audio_bytes)
+        if audio is None:
+            log.warning("❌ Can't decode %s audio", container)
+            return None
+        return audio, Config.SAMPLE_RATE
+    
+    # Headerless PCM only when the client says so; anything else is
+    # rejected instead of burning a Whisper pass on noise
+    if (mimetype or "").split(";")[0].strip().lower() in RAW_PCM_MIMETYPES and len(audio_bytes) % 2 == 0:
+        audio = np.frombuffer(audio_bytes, dtype='<i2').astype(np.float32)
+        audio *= 1.0 / 32768
+        return audio, Config.SAMPLE_RATE
+    
+    log.warning("❌ Unrecognized audio format (%s, %d bytes)", mimetype or "no content type", len(audio_bytes))
+    return None
+
+# ============================================================
+# COMMAND-MODE EARLY STOP
+# ============================================================
+class CommandPhraseStop:
+    """
+    Generation stopping criterion: a sequence is finished once its
+    decoded text equals a known command phrase that no longer phrase
+    with a different meaning extends word by word, and the phrase has
+    ended: the newest token starts a new word (space or punctuation).
+    "maju" stops ("maju robot" means the same), "nyalakan lampu" waits
+    for a possible "merah", and " bel" + "ok" is not mistaken for "bel".
+    """
+    
+    def __init__(self, tokenizer, phrases: Iterable[str], labels: Optional[Iterable[str]] = None):
+        self.tokenizer = tokenizer
+        # Without labels every phrase counts as its own meaning
+        labels = labels if labels is not None else itertools.count()
+        meanings: Dict[str, set] = {}
+        for phrase, label in zip(phrases, labels):
+            meanings.setdefault(self.normalize(phrase), set()).add(label)
+        meanings.pop("", None)
+        
+        self.terminal = {
+            p for p, own in meanings.items()
+            if not any(other.startswith(p + " ") and not other_labels <= own
+                       for other, other_labels in meanings.items())
+        }
+
+    @classmethod
+    def from_training_data(cls, tokenizer) -> "CommandPhraseStop":
+        from ml_ai import MLRobotAI
+        texts, labels = MLRobotAI().create_training_data()
+        return cls(tokenizer, texts, labels)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+    @staticmethod
+    def starts_word(piece: str) -> bool:
+        """True if a decoded token can't continue the previous word"""
+        # "\ufffd" is half of a multi-byte character, so still inside a word
+        return not piece or not (piece[0].isalnum() or piece[0] in "_\ufffd")
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+        # The phrase is everything before the newest token, which must open a new word
+        texts = self.tokenizer.batch_decode(input_ids[:, :-1], skip_special_tokens=True)
+        pieces = self.tokenizer.batch_decode(input_ids[:, -1:], skip_special_tokens=True)
+        return torch.tensor(
+            [self.normalize(t) in self.terminal and self.starts_word(piece) for t, piece in zip(texts, pieces)],
+            dtype=torch.bool, device=input_ids.device
+        )
+
+# ============================================================
+# SPEECH-TO-TEXT (Whisper)
+# ============================================================
+class SpeechToText:
+    BACKENDS = ("torch", "int8", "onnx")
+    
+    def __init__(self, model_name=None, backend=None):
+        import torch
+        from transformers import WhisperProcessor
+        
+        model_name = model_name or Config.WHISPER_MODEL
+        self.backend = backend or Config.STT_BACKEND
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown STT backend '{self.backend}' (expected one of {', '.join(self.BACKENDS)})")
+        
+        if Config.TORCH_THREADS > 0:
+            torch.set_num_threads(Config.TORCH_THREADS)
+        
+        # Quantized and ONNX Runtime models only run on the CPU
+        use_cuda = torch.cuda.is_available() and self.backend == "torch"
+        self.device = torch.device("cuda" if use_cuda else "cpu")
+        log.info("🧠 Loading Whisper model (%s, backend=%s) on %s...", model_name, self.backend, self.device)
+        
+        try:
+            self.processor = WhisperProcessor.from_pretrained(model_name)
+            self.model = self._load_model(model_name)
+            
+            try:
+                self.model.config.forced_decoder_ids = None
+            except Exception:
+                pass
+            
+            log.info("✅ Whisper model loaded successfully")
+        except Exception as e:
+            log.error("❌ Failed to load Whisper model: %s", e)
+            raise
+
+    def _load_model(self, model_name: str):
+        """Load the Whisper model for the configured backend"""
+        import torch
+        
+        if self.backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+            except ImportError as e:
+                raise RuntimeError("STT_BACKEND=onnx requires 'optimum[onnxruntime]'") from e
+            # Exports to ONNX on first load; same generate() interface
+            return ORTModelForSpeechSeq2Seq.from_pretrained(model_name, export=True)
+        
+        from transformers import WhisperForConditionalGeneration
+        model = WhisperForConditionalGeneration.from_pretrained(model_name).eval()
+        
+        if self.backend == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        
+        return model.to(self.device)
+
+    def decode_audio(self, audio_bytes: bytes, mimetype: Optional[str] = None) -> Optional[Tuple[np.ndarray, int]]:
+        """See decode_upload(); kept for callers that hold a SpeechToText"""
+        return decode_upload(audio_bytes, mimetype)
+
+    def max_new_tokens_for(self, clips: List[Tuple[np.ndarray, int]]) -> int:
+        """Decode budget for the longest clip in the batch"""
+        seconds = max(len(audio) / sr for audio, sr in clips)
+        budget = int(np.ceil(seconds * Config.STT_TOKENS_PER_SECOND)) + Config.STT_MIN_NEW_TOKENS
+        return min(budget, Config.STT_MAX_NEW_TOKENS)
+
+    def _generate_kwargs(self, clips: List[Tuple[np.ndarray, int]]) -> dict:
+        kwargs = {
+            "max_new_tokens": self.max_new_tokens_for(clips),
+            "num_beams": 1,
+            "do_sample": False,
+            "task": "transcribe",
+        }
+        if Config.STT_LANGUAGE:
+            kwargs["language"] = Config.STT_LANGUAGE
+        if Config.STT_EARLY_STOP:
+            from transformers import StoppingCriteriaList
+            kwargs["stopping_criteria"] = StoppingCriteriaList([self.command_stop])
+        return kwargs
+
+    @property
+    def command_stop(self) -> "CommandPhraseStop":
+        if getattr(self, "_command_stop", None) is None:
+            self._command_stop = CommandPhraseStop.from_training_data(self.processor.tokenizer)
+        return self._command_stop
+
+    def transcribe_batch_with_stats(self, clips: List[Tuple[np.ndarray, int]]) -> List[Tuple[str, dict]]:
+        """Transcribe several decoded clips with a single generate call"""
+        import torch
+        
+        # Whisper pads every clip to the same 30 s mel window, so the
+        # per-clip features stack directly into one batch tensor
+        start = time.perf_counter()
+        features = [
+            self.processor(audio, sampling_rate=sr, return_tensors="pt").input_features
+            for audio, sr in clips
+        ]
+        input_features = torch.cat(features, dim=0).to(self.device)
+        feature_seconds = time.perf_counter() - start
+        metrics.observe("feature_extraction", feature_seconds)
+        kwargs = self._generate_kwargs(clips)
+        
+        start = time.perf_counter()
+        with torch.no_grad():
+            predicted_ids = self.model.generate(input_features, **kwargs)
+        decode_seconds = time.perf_counter() - start
+        metrics.observe("whisper_generate", decode_seconds)
+        decode_ms = decode_seconds * 1000
+        
+        texts = self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
+        special = set(self.processor.tokenizer.all_special_ids)
+        
+        results = []
+        for text, ids in zip(texts, predicted_ids.tolist()):
+            stats = {
+                "tokens": sum(1 for t in ids if t not in special),
+                "max_new_tokens": kwargs["max_new_tokens"],
+                "feature_ms": round(feature_seconds * 1000, 1),
+                "decode_ms": round(decode_ms, 1),
+                "batch_size": len(clips),
+            }
+            results.append((text.strip(), stats))
+        return results
+
+    def transcribe_batch(self, clips: List[Tuple[np.ndarray, int]]) -> List[str]:
+        return [text for text, _ in self.transcribe_batch_with_stats(clips)]
+
+    def process_audio(self, audio_bytes: bytes) -> str:
+        """Process audio bytes and return transcribed text"""
+        try:
+            clip = self.decode_audio(audio_bytes)
+            if clip is None:
+                return ""
+            
+            text = self.transcribe_batch([clip])[0]
+            
+            log.debug("🎙️ Transcribed: %s", text)
+            return text
+            
+        except Exception as e:
+            log.exception("❌ Error in process_audio: %s", e)
+            return ""
+
+# ============================================================
+# TRANSCRIPTION BATCHER - Dynamic micro-batching for Whisper
+# ============================================================
+class TranscriptionQueueFull(Exception):
+    """Raised when more clips are waiting than STT_QUEUE_SIZE allows"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Transcription queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class TranscriptionBatcher:
+    """
+    Collects concurrent transcription requests for a short window
+    (or until the batch is full) and runs them through one Whisper
+    generate call. Request threads block on a Future for their text.
+    
+    With an InferencePool, one dispatch thread per worker process keeps
+    every worker busy. Every clip goes through the queue, even with
+    batching off, so waiting clips are capped at queue_size; beyond
+    that _submit raises TranscriptionQueueFull instead of queueing.
+    """
+    
+    def __init__(self, stt, max_batch_size: int = None, window_ms: float = None,
+                 concurrency: int = 1, queue_size: int = None):
+        self.stt = stt
+        self.max_batch_size = max(1, max_batch_size or Config.STT_BATCH_SIZE)
+        self.window = (window_ms if window_ms is not None else Config.STT_BATCH_WINDOW_MS) / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size or Config.STT_QUEUE_SIZE)
+        self._workers = []
+        self._batch_seconds = 1.0  # Moving average, for Retry-After
+        
+        for i in range(max(1, concurrency)):
+            worker = threading.Thread(target=self._run, name=f"stt-batcher-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        if self.max_batch_size > 1:
+            log.info("✅ Whisper batching enabled (batch=%d, window=%.0fms, dispatchers=%d)",
+                     self.max_batch_size, self.window * 1000, len(self._workers))
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        batches = math.ceil(self._queue.qsize() / (self.max_batch_size * max(1, len(self._workers))))
+        return max(1, math.ceil(batches * self._batch_seconds))
+
+    def _submit(self, clip: Tuple[np.ndarray, int]) -> Tuple[str, dict]:
+        """Transcribe one clip, batched with any concurrent requests"""
+        if not self._workers:
+            # Only after close(), while shutting down
+            return self.stt.transcribe_batch_with_stats([clip])[0]
+        
+        future = Future()
+        try:
+            self._queue.put_nowait((clip, future))
+        except queue.Full:
+            raise TranscriptionQueueFull(self.retry_after()) from None
+        return future.result()
+
+    def transcribe(self, audio_bytes: bytes, mimetype: Optional[str] = None) -> Tuple[str, Optional[dict]]:
+        """Transcribe uploaded bytes; returns (text, decode stats)"""
+        try:
+            # Decoding runs on the request thread; only generate is batched
+            clip = decode_upload(audio_bytes, mimetype)
+            if clip is None:
+                return "", None
+            
+            text, stats = self._submit(clip)
+            
+            log.info("🎙️ Transcribed: %s (%d tokens, %.0fms)", text, stats["tokens"], stats["decode_ms"])
+            return text, stats
+            
+        except TranscriptionQueueFull:
+            raise
+        except Exception as e:
+            log.exception("❌ Error in process_audio: %s", e)
+            return "", None
+
+    def process_audio(self, audio_bytes: bytes) -> str:
+        """Same contract as SpeechToText.process_audio, but batched"""
+        return self.transcribe(audio_bytes)[0]
+
+    def transcribe_clip(self, audio: np.ndarray, sr: int) -> Tuple[str, Optional[dict]]:
+        """Transcribe an already decoded clip (used by the streaming path)"""
+        try:
+            text, stats = self._submit((audio, sr))
+            
+            log.info("🎙️ Transcribed: %s (%d tokens, %.0fms)", text, stats["tokens"], stats["decode_ms"])
+            return text, stats
+            
+        except TranscriptionQueueFull:
+            raise
+        except Exception as e:
+            log.exception("❌ Error in transcribe_clip: %s", e)
+            return "", None
+
+    def _collect_batch(self, first) -> list:
+        """Gather requests until the window closes or the batch is full"""
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the shutdown marker for the main loop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        
+        return batch
+
+    def _run(self):
+        """Worker loop: one generate call per collected batch"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            
+            batch = self._collect_batch(first)
+            clips = [clip for clip, _ in batch]
+            
+            start = time.perf_counter()
+            try:
+                results = self.stt.transcribe_batch_with_stats(clips)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._batch_seconds = 0.8 * self._batch_seconds + 0.2 * (time.perf_counter() - start)
+            
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        """Stop the dispatch threads"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._workers = []
+
+# ============================================================
+# INFERENCE WORKERS - Whisper in separate processes
+# ============================================================
+def _inference_worker(conn, shm_name: str):
+    """
+    Worker process main loop. Each request is a list of
+    (offset, length, sample_rate) slots in the shared buffer;
+    the reply is ("ok", results) or ("error", message).
+    """
+    atexit.unregister(cleanup)  # The server process owns shutdown
+    shm = shared_memory.SharedMemory(name=shm_name)
+    samples = np.ndarray((shm.size // 4,), dtype=np.float32, buffer=shm.buf)
+    try:
+        model = SpeechToText()
+        model.transcribe_batch([(np.zeros(Config.SAMPLE_RATE, dtype=np.float32), Config.SAMPLE_RATE)])
+        conn.send(("ready", os.getpid()))
+        
+        while True:
+            slots = conn.recv()
+            if slots is None:
+                break
+            try:
+                clips = [(samples[offset:offset + length], sr) for offset, length, sr in slots]
+                conn.send(("ok", model.transcribe_batch_with_stats(clips)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+            finally:
+                clips = None
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        del samples
+        shm.close()
+
+class InferenceWorker:
+    """One Whisper process plus the shared buffer its clips are written to"""
+    
+    def __init__(self, index: int, max_batch_size: int):
+        self.index = index
+        self.slot_samples = int(Config.STT_MAX_CLIP_SECONDS * max(Config.SAMPLE_RATE, Config.STREAM_SAMPLE_RATE))
+        self.shm = shared_memory.SharedMemory(create=True, size=max_batch_size * self.slot_samples * 4)
+        self.samples = np.ndarray((max_batch_size * self.slot_samples,), dtype=np.float32, buffer=self.shm.buf)
+        self.process = None
+        self.conn = None
+
+    def start(self, timeout: float):
+        """Spawn the process and wait until its model is loaded"""
+        self.launch()
+        self.wait_ready(timeout)
+
+    def launch(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_inference_worker, args=(child_conn, self.shm.name),
+                              name=f"stt-worker-{self.index}", daemon=True)
+        try:
+            process.start()
+        finally:
+            child_conn.close()
+        self.process = process
+
+    def wait_ready(self, timeout: float):
+        if not self.conn.poll(timeout):
+            self.stop()
+            raise RuntimeError(f"stt-worker-{self.index} did not load within {timeout:.0f}s")
+        status, detail = self.conn.recv()
+        if status != "ready":
+            self.stop()
+            raise RuntimeError(f"stt-worker-{self.index} failed to load: {detail}")
+        log.info("✅ Whisper worker %d ready (pid %s)", self.index, detail)
+
+    def run(self, clips: List[Tuple[np.ndarray, int]]) -> List[Tuple[str, dict]]:
+        """Copy clips into shared memory and transcribe them in the worker"""
+        slots = []
+        for i, (audio, sr) in enumerate(clips):
+            offset = i * self.slot_samples
+            length = min(len(audio), int(Config.STT_MAX_CLIP_SECONDS * sr), self.slot_samples)
+            self.samples[offset:offset + length] = audio[:length]
+            slots.append((offset, length, sr))
+        
+        self.conn.send(slots)
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"stt-worker-{self.index}: {payload}")
+        return payload
+
+    def stop(self):
+        if self.process is None:
+            return
         try:
-            self.arduino.write((command + "\n").encode())
-            time.sleep(0.05)
-            response = self.arduino.readline().decode(errors="ignore").strip()
-            return response if response else "OK"
-        except Exception as e:
-            self.connected = False
-            self.error = str(e)
-            print(f"⚠️ Serial error: {e}")
-            return "ERROR"
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        self.conn.close()
+        self.process = None
 
-    def disconnect(self):
-        """Disconnect from Arduino"""
-        if self.arduino:
-            try:
-                self.arduino.close()
-                self.connected = False
-                print("✅ Arduino disconnected")
-            except Exception as e:
-                print(f"⚠️ Disconnect error: {e}")
+    def close(self):
+        self.stop()
+        del self.samples
+        self.shm.close()
+        self.shm.unlink()
 
-# ============================================================
-# SPEECH-TO-TEXT (Whisper)
-# ============================================================
-class SpeechToText:
-    def __init__(self, model_name=None):
-        model_name = model_name or Config.WHISPER_MODEL
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"🧠 Loading Whisper model ({model_name}) on {self.device}...")
+class InferencePool:
+    """
+    Runs Whisper in worker processes so a long generate call never
+    holds the server's GIL. Audio goes through a per-worker shared
+    memory buffer instead of being pickled; only slot offsets and the
+    resulting text cross the pipe. Same transcribe_batch_with_stats
+    interface as SpeechToText, so TranscriptionBatcher can drive it.
+    """
+    
+    def __init__(self, workers: int = None, max_batch_size: int = None, start_timeout: float = 600):
+        workers = max(1, workers or Config.STT_WORKERS)
+        max_batch_size = max(1, max_batch_size or Config.STT_BATCH_SIZE)
+        self.start_timeout = start_timeout
+        self.workers = [InferenceWorker(i, max_batch_size) for i in range(workers)]
+        self._idle = queue.Queue()
         
         try:
-            self.processor = WhisperProcessor.from_pretrained(model_name)
-            self.model = WhisperForConditionalGeneration.from_pretrained(model_name).to(self.device)
-            
-            try:
-                self.model.config.forced_decoder_ids = None
-            except Exception:
-                pass
-            
-            print("✅ Whisper model loaded successfully")
-        except Exception as e:
-            print(f"❌ Failed to load Whisper model: {e}")
+            # Load the models side by side
+            for worker in self.workers:
+                worker.launch()
+            for worker in self.workers:
+                worker.wait_ready(start_timeout)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
             raise
 
-    def _read_wav_from_bytes(self, wav_bytes: bytes):
-        """Parse WAV bytes and return (numpy_array, sample_rate)"""
-        try:
-            bio = io.BytesIO(wav_bytes)
-            with wave.open(bio, "rb") as wf:
-                sr = wf.getframerate()
-                frames = wf.readframes(wf.getnframes())
-                sampwidth = wf.getsampwidth()
-                channels = wf.getnchannels()
-            
-            # Determine dtype
-            dtype = np.int16 if sampwidth == 2 else (np.int32 if sampwidth == 4 else np.int16)
-            
-            # Convert to float32
-            audio = np.frombuffer(frames, dtype=dtype).astype(np.float32)
-            
-            # Normalize
-            if dtype == np.int16:
-                audio = audio / 32768.0
-            elif dtype == np.int32:
-                audio = audio / (2**31)
-            
-            # Convert stereo to mono
-            if channels == 2:
-                audio = audio.reshape(-1, 2).mean(axis=1)
-            
-            return audio, sr
-        except Exception as e:
-            print(f"⚠️ WAV parsing error: {e}")
-            return None, None
+    def __len__(self) -> int:
+        return len(self.workers)
 
-    def process_audio(self, audio_bytes: bytes) -> str:
-        """Process audio bytes and return transcribed text"""
-        if not audio_bytes:
-            return ""
+    def transcribe_batch_with_stats(self, clips: List[Tuple[np.ndarray, int]]) -> List[Tuple[str, dict]]:
+        worker = self._idle.get()
+        try:
+            if worker.process is None:
+                # An earlier restart failed; the next batch to get the slot retries it
+                log.warning("⚠️ Whisper worker %d is down, restarting", worker.index)
+                worker.start(self.start_timeout)
+            results = worker.run(clips)
+        except (EOFError, OSError) as e:
+            # The process died mid-batch; replace it before releasing the slot
+            log.error("❌ Whisper worker %d crashed: %s, restarting", worker.index, e)
+            worker.stop()
+            try:
+                worker.start(self.start_timeout)
+            except Exception as restart_error:
+                # process stays None, so the slot is never run as is
+                worker.stop()
+                log.error("❌ Whisper worker %d did not restart: %s", worker.index, restart_error)
+            raise RuntimeError(f"stt-worker-{worker.index} crashed") from e
+        finally:
+            self._idle.put(worker)
         
-        # Check size limit
-        if len(audio_bytes) > Config.MAX_AUDIO_SIZE:
-            print(f"⚠️ Audio too large: {len(audio_bytes)} bytes")
-            return ""
+        # The worker's own histograms live in its process; record them here
+        stats = results[0][1]
+        metrics.observe("feature_extraction", stats["feature_ms"] / 1000)
+        metrics.observe("whisper_generate", stats["decode_ms"] / 1000)
+        return results
+
+    def transcribe_batch(self, clips: List[Tuple[np.ndarray, int]]) -> List[str]:
+        return [text for text, _ in self.transcribe_batch_with_stats(clips)]
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+
+# ============================================================
+# KEYWORD MATCHER - Compiled fallback matching
+# ============================================================
+def _build_trie_pattern(words: Iterable[str]) -> str:
+    """Build a regex from a character trie so shared prefixes are scanned once"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional: a longer keyword through this node is preferred
+        return '(?:' + body + ')?' if '' in node else body
+    
+    return build(trie)
+
+class KeywordMatcher:
+    """
+    Keyword -> command lookup compiled once into a single regex.
+    
+    One scan finds every keyword occurrence (overlapping, longest
+    match per position) plus any numbers. The longest keyword wins;
+    ties go to the keyword declared first. Frequency words only apply
+    when no mapped keyword matched and the text contains a number.
+    """
+    
+    def __init__(self, mapping: Dict[str, str], frequency_words: Iterable[str] = ()):
+        self.mapping = dict(mapping)
+        self.frequency_words = frozenset(frequency_words)
+        self._priority = {keyword: i for i, keyword in enumerate(self.mapping)}
         
-        try:
-            # Try to read as WAV
-            audio, sr = self._read_wav_from_bytes(audio_bytes)
-            
-            if audio is None:
-                # Fallback: assume raw PCM int16 at 16kHz
-                try:
-                    audio = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-                    sr = 16000
-                except Exception as e:
-                    print(f"❌ Can't interpret audio bytes: {e}")
-                    return ""
-            
-            # Ensure 1D float32
-            audio = audio.astype(np.float32)
-            if audio.ndim > 1:
-                audio = audio.mean(axis=1)
+        words = set(self.mapping) | self.frequency_words
+        self._pattern = re.compile(r'(?=(%s))|(\d+)' % _build_trie_pattern(words))
 
-            # Process with Whisper
-            inputs = self.processor(audio, sampling_rate=sr, return_tensors="pt")
-            input_features = inputs.input_features.to(self.device)
-            
-            with torch.no_grad():
-                predicted_ids = self.model.generate(input_features, max_new_tokens=512)
-            
-            text = self.processor.batch_decode(predicted_ids, skip_special_tokens=True)[0].strip()
-            
-            print(f"🎙️ Transcribed: {text}")
-            return text
+    def match(self, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (matched keyword, command) or (None, None)"""
+        best = None
+        best_key = None
+        frequency_word = None
+        number = None
+        
+        for m in self._pattern.finditer(text):
+            keyword, digits = m.group(1), m.group(2)
+            if digits is not None:
+                if number is None:
+                    number = int(digits)
+                continue
             
-        except Exception as e:
-            print(f"❌ Error in process_audio: {e}")
-            traceback.print_exc()
-            return ""
+            if keyword in self._priority:
+                key = (len(keyword), -self._priority[keyword])
+                if best_key is None or key > best_key:
+                    best, best_key = keyword, key
+            if keyword in self.frequency_words and frequency_word is None:
+                frequency_word = keyword
+        
+        if best is not None:
+            return best, self.mapping[best]
+        
+        if frequency_word is not None and number is not None:
+            freq = max(20, min(20000, number))
+            duration = 2
+            return frequency_word, f"S{freq}:{duration}"
+        
+        return None, None
 
 # ============================================================
 # VOICE AI - Command Processing using ML
 # ============================================================
 class VoiceAI:
+    ML_THRESHOLD = 0.3  # Below this confidence, fall back to keywords
+    
     def __init__(self, use_ml_model: bool = True):
         self.use_ml_model = use_ml_model
         self.ml_ai = None
         
         if self.use_ml_model:
             try:
-                print("🧠 Initializing ML AI model...")
-                self.ml_ai = MLRobotAI()
+                log.info("🧠 Initializing ML AI model...")
+                # Imported here: scikit-learn alone takes ~1 s to import
+                from ml_ai import MLRobotAI
+                self.ml_ai = MLRobotAI(online=Config.ML_ONLINE)
                 
-                # Try to load existing model, otherwise train
-                if not self.ml_ai.load_model('robot_ml_model.pkl'):
-                    print("📚 Training new ML model...")
+                # Load saved weights; retrain when missing or stale
+                if not self.ml_ai.load_model():
+                    log.info("📚 Training new ML model...")
                     self.ml_ai.train(save_model=True)
                 
-                print("✅ ML AI model ready")
+                log.info("✅ ML AI model ready")
             except Exception as e:
-                print(f"⚠️ ML model failed, using fallback: {e}")
+                log.warning("⚠️ ML model failed, using fallback: %s", e)
                 self.ml_ai = None
         
         # Fallback command mapping (if ML fails)
@@ -295,6 +2059,12 @@ class VoiceAI:
             "bel": "S2000:1",
             "bunyi": "S2000:1",
         }
+        
+        # Compiled once; the frequency rule shares the same scan
+        self.keyword_matcher = KeywordMatcher(
+            self.command_mapping,
+            frequency_words=["suara", "nada", "bunyi", "frekuensi"],
+        )
 
     def process_command(self, text: str) -> Optional[str]:
         """Process voice command and return Arduino command string"""
@@ -302,39 +2072,370 @@ class VoiceAI:
             return None
         
         txt = text.lower().strip()
-        print(f"[AI] Processing: {txt}")
+        log.debug("[AI] Processing: %s", txt)
         
         # 1) Try ML model first
         if self.ml_ai:
             try:
-                command = self.ml_ai.process_command(txt, threshold=0.3, verbose=True)
-                if command:
-                    print(f"[ML AI] Command found: {command}")
+                if not self.ml_ai.is_trained:
+                    self.ml_ai.train()
+                label, confidence, command, cached = self.ml_ai.classify(txt)
+                log.debug("[ML AI] Predicted: %s (%.1f%%)%s", label, confidence * 100, " [cached]" if cached else "")
+                if command and confidence >= self.ML_THRESHOLD:
+                    log.debug("[ML AI] Command found: %s", command)
                     return command
             except Exception as e:
-                print(f"[ML AI] Error: {e}")
-        
-        # 2) Fallback to keyword matching
-        print("[AI] Using fallback keyword matching...")
-        for keyword, cmd in self.command_mapping.items():
-            if keyword in txt:
-                print(f"[AI] Matched keyword: {keyword} -> {cmd}")
-                return cmd
-        
-        # 3) Handle sound frequency commands
-        import re
-        if any(word in txt for word in ["suara", "nada", "bunyi", "frekuensi"]):
-            numbers = re.findall(r'\d+', txt)
-            if numbers:
-                freq = int(numbers[0])
-                freq = max(20, min(20000, freq))
-                duration = 2
-                cmd = f"S{freq}:{duration}"
-                print(f"[AI] Sound frequency: {freq}Hz -> {cmd}")
-                return cmd
-        
-        print("[AI] No command matched")
+                log.warning("[ML AI] Error: %s", e)
+        
+        # 2) Fallback to keyword matching (includes sound frequency commands)
+        return self._match_keywords(txt)
+    
+    def process_commands(self, texts: List[str]) -> List[Optional[str]]:
+        """process_command() for many texts, with one batched ML pass"""
+        txts = [text.lower().strip() if text else "" for text in texts]
+        commands = [None] * len(txts)
+        
+        if self.ml_ai:
+            try:
+                commands = self.ml_ai.process_commands(txts, threshold=self.ML_THRESHOLD)
+            except Exception as e:
+                log.warning("[ML AI] Error: %s", e)
+        
+        return [
+            command or (self._match_keywords(txt) if txt else None)
+            for txt, command in zip(txts, commands)
+        ]
+    
+    def _match_keywords(self, txt: str) -> Optional[str]:
+        log.debug("[AI] Using fallback keyword matching...")
+        keyword, cmd = self.keyword_matcher.match(txt)
+        if cmd:
+            log.debug("[AI] Matched keyword: %s -> %s", keyword, cmd)
+            return cmd
+        
+        log.debug("[AI] No command matched")
         return None
+    
+    def learn(self, pairs: List[Tuple[str, str]]) -> int:
+        """Fold confirmed (text, label) pairs into the live ML model"""
+        if not (self.ml_ai and self.ml_ai.online):
+            raise RuntimeError("Online learning is disabled (set ML_ONLINE=1)")
+        count = self.ml_ai.learn([(text.lower().strip(), label) for text, label in pairs])
+        log.info("📚 Learned %d confirmed utterance(s)", count)
+        return count
+
+# ============================================================
+# STREAMING INGESTION - Energy-based voice-activity detection
+# ============================================================
+class EnergyVAD:
+    """
+    Cheap frame-energy gate for streamed PCM. Leading silence is
+    dropped, and an utterance is emitted as soon as it is followed
+    by VAD_SILENCE_MS of silence.
+    """
+    
+    PREROLL_FRAMES = 3  # Keep a little audio before the onset
+    
+    def __init__(self, sample_rate: int = None):
+        self.sample_rate = sample_rate or Config.STREAM_SAMPLE_RATE
+        self.frame_len = self.sample_rate * Config.VAD_FRAME_MS // 1000
+        self.threshold = Config.VAD_ENERGY_THRESHOLD
+        self.silence_frames = max(1, Config.VAD_SILENCE_MS // Config.VAD_FRAME_MS)
+        self.min_speech_frames = max(1, Config.VAD_MIN_SPEECH_MS // Config.VAD_FRAME_MS)
+        self.max_frames = Config.VAD_MAX_UTTERANCE_S * 1000 // Config.VAD_FRAME_MS
+        
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=self.PREROLL_FRAMES)
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_run = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._frames)
+
+    def feed(self, samples: np.ndarray) -> List[np.ndarray]:
+        """Add float32 samples; return any utterances completed by them"""
+        if self._pending.size:
+            samples = np.concatenate([self._pending, samples])
+        
+        n_frames = len(samples) // self.frame_len
+        usable = n_frames * self.frame_len
+        self._pending = samples[usable:].copy()
+        if n_frames == 0:
+            return []
+        
+        frames = samples[:usable].reshape(n_frames, self.frame_len)
+        voiced = np.sqrt(np.mean(frames * frames, axis=1)) >= self.threshold
+        
+        utterances = []
+        for frame, is_voiced in zip(frames, voiced):
+            if not self._frames:
+                if is_voiced:
+                    self._frames.extend(self._preroll)
+                    self._preroll.clear()
+                    self._frames.append(frame)
+                    self._speech_frames = 1
+                    self._silent_run = 0
+                else:
+                    self._preroll.append(frame)
+                continue
+            
+            self._frames.append(frame)
+            if is_voiced:
+                self._speech_frames += 1
+                self._silent_run = 0
+            else:
+                self._silent_run += 1
+            
+            if self._silent_run >= self.silence_frames or len(self._frames) >= self.max_frames:
+                utterance = self._finish()
+                if utterance is not None:
+                    utterances.append(utterance)
+        
+        return utterances
+
+    def flush(self) -> Optional[np.ndarray]:
+        """End of stream: return the utterance in progress, if any"""
+        self._pending = np.zeros(0, dtype=np.float32)
+        return self._finish() if self._frames else None
+
+    def _finish(self) -> Optional[np.ndarray]:
+        """Close the current utterance, trimming trailing silence"""
+        keep = len(self._frames) - max(0, self._silent_run - self.PREROLL_FRAMES)
+        frames = self._frames[:keep]
+        speech_frames = self._speech_frames
+        
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_run = 0
+        
+        if speech_frames < self.min_speech_frames:
+            return None  # Click or noise burst
+        return np.concatenate(frames)
+
+class StreamSession:
+    """State for one client audio stream"""
+    
+    def __init__(self, sample_rate: int = None, robot_id: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.robot_id = robot_id
+        self.vad = EnergyVAD(sample_rate)
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+        self.received = 0    # PCM bytes accepted so far
+        self.pending = []    # Utterances the VAD closed that aren't transcribed yet
+        self.results = []    # Executed, but not yet returned to the client
+
+stream_sessions = {}
+stream_sessions_lock = threading.Lock()
+_stream_reaper: Optional[threading.Thread] = None
+_stream_reaper_stop = threading.Event()
+
+def _expire_stream_sessions():
+    """Drop streams that have been idle for longer than the TTL"""
+    cutoff = time.monotonic() - Config.STREAM_SESSION_TTL
+    with stream_sessions_lock:
+        for session_id in [sid for sid, s in stream_sessions.items() if s.last_seen < cutoff]:
+            del stream_sessions[session_id]
+
+def _start_stream_reaper():
+    """Expire idle streams on a timer, even if no new stream is opened"""
+    global _stream_reaper
+    with stream_sessions_lock:
+        if _stream_reaper is not None and _stream_reaper.is_alive():
+            return
+        # Started lazily so it runs in the serving process, not a pre-fork parent
+        _stream_reaper = threading.Thread(target=_reap_stream_sessions, name="stream-reaper", daemon=True)
+        _stream_reaper.start()
+
+def _reap_stream_sessions():
+    while not _stream_reaper_stop.wait(Config.STREAM_SESSION_TTL / 2):
+        _expire_stream_sessions()
+
+# ============================================================
+# COMMAND HISTORY - Lock-free ring + persistent SQLite log
+# ============================================================
+class CommandHistory:
+    """
+    Recent commands in a fixed-size ring, plus every command in an
+    append-only SQLite table (WAL mode) for paging and time ranges.
+    
+    append() is lock-free: ids come from an itertools counter (atomic
+    under the GIL) and each slot holds an (id, entry) pair, so readers
+    skip slots that were overwritten or are not written yet. Rows reach
+    SQLite through a queue drained by one writer thread, which commits
+    whatever has accumulated in a single transaction.
+    """
+    
+    COLUMNS = ("id", "ts", "status", "text", "command", "response", "robot_id")
+    
+    def __init__(self, path: Optional[str], capacity: int):
+        self.path = path or None
+        self.capacity = capacity
+        self._ring: List[Optional[Tuple[int, dict]]] = [None] * capacity
+        self._ids = itertools.count(1)
+        self._head = 0  # Newest id written (may briefly lag; readers probe past it)
+        self._pending = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._written = 0  # Newest id committed to SQLite
+    
+    def start(self):
+        """Open the log, reload the newest entries and start the writer"""
+        if self.path is None:
+            log.info("📜 Command history kept in memory only (HISTORY_DB is empty)")
+            return
+        try:
+            db = self._connect()
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY, ts REAL NOT NULL, "
+                "status TEXT, text TEXT, command TEXT, response TEXT, robot_id TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS history_ts ON history (ts)")
+            rows = db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM history ORDER BY id DESC LIMIT ?",
+                              (self.capacity,)).fetchall()
+        except sqlite3.Error as e:
+            log.warning("⚠️ Command history log unavailable (%s), keeping it in memory only", e)
+            self.path = None
+            return
+        
+        for row in reversed(rows):
+            entry = self._entry(row)
+            self._ring[entry["id"] % self.capacity] = (entry["id"], entry)
+        last_id = rows[0][0] if rows else 0
+        self._ids = itertools.count(last_id + 1)
+        self._head = self._written = last_id
+        
+        self._writer = threading.Thread(target=self._write_loop, args=(db,), name="history-writer", daemon=True)
+        self._writer.start()
+        log.info("📜 Command history: %s (%d recent entries loaded)", self.path, len(rows))
+    
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # fsync at checkpoints, not every commit
+        return db
+    
+    @staticmethod
+    def _entry(row) -> dict:
+        entry = dict(zip(CommandHistory.COLUMNS, row))
+        entry["timestamp"] = datetime.fromtimestamp(entry["ts"]).strftime("%H:%M:%S")
+        return entry
+    
+    def append(self, result: dict) -> dict:
+        """Record a result; returns it with its id and ts"""
+        entry = dict(result, id=next(self._ids), ts=round(time.time(), 3))
+        self._ring[entry["id"] % self.capacity] = (entry["id"], entry)
+        self._head = entry["id"]
+        if self._writer is not None:
+            self._pending.put(entry)
+        return entry
+    
+    def _write_loop(self, db: sqlite3.Connection):
+        insert = f"INSERT OR REPLACE INTO history ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})"
+        running = True
+        while running:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            
+            rows = [tuple(item.get(c) for c in self.COLUMNS) for item in batch if isinstance(item, dict)]
+            if rows:
+                try:
+                    with db:
+                        db.executemany(insert, rows)
+                    self._written = max(self._written, max(row[0] for row in rows))
+                except sqlite3.Error as e:
+                    log.error("⚠️ Command history write failed: %s", e)
+            
+            # Markers: an Event to set once the batch is committed, None to stop
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is None:
+                    running = False
+        db.close()
+    
+    def flush(self, timeout: float = 1.0):
+        """Wait until every appended entry is in SQLite"""
+        if self._writer is None or self._written >= self._head:
+            return
+        done = threading.Event()
+        self._pending.put(done)
+        done.wait(timeout)
+    
+    def close(self):
+        if self._writer is not None:
+            self._pending.put(None)
+            self._writer.join(timeout=5)
+            self._writer = None
+    
+    def _newest_id(self) -> int:
+        head = self._head
+        # A concurrent append may have written a newer slot than _head says
+        while True:
+            slot = self._ring[(head + 1) % self.capacity]
+            if slot is None or slot[0] != head + 1:
+                return head
+            head += 1
+    
+    def _from_ring(self, limit: int, before: Optional[int], partial: bool = False) -> Optional[List[dict]]:
+        """
+        Newest-first entries below `before`, or None if the ring no longer
+        holds them all (with partial=True, the run found before the gap)
+        """
+        newest = self._newest_id()
+        top = newest if before is None else min(newest, before - 1)
+        entries = []
+        for entry_id in range(top, max(top - limit, 0), -1):
+            slot = self._ring[entry_id % self.capacity]
+            if slot is None or slot[0] != entry_id:
+                # Overwritten (or in flight): ask SQLite
+                return entries if partial else None
+            entries.append(slot[1])
+        return entries
+    
+    def recent(self, limit: int) -> List[dict]:
+        """The newest `limit` entries, newest first, from memory"""
+        return self._from_ring(min(limit, self.capacity), None, partial=True)
+    
+    def query(self, limit: int, before: Optional[int] = None,
+              since: Optional[float] = None, until: Optional[float] = None) -> List[dict]:
+        """
+        Newest-first page of entries with id < before and
+        since <= ts < until (each bound optional)
+        """
+        if since is None and until is None and limit <= self.capacity:
+            entries = self._from_ring(limit, before)
+            if entries is not None:
+                return entries
+        if self._writer is None:
+            # No log, or start() hasn't opened it yet: answer from memory
+            slots = sorted((slot for slot in list(self._ring) if slot), key=lambda slot: slot[0], reverse=True)
+            return [
+                entry for _, entry in slots
+                if (before is None or entry["id"] < before)
+                and (since is None or entry["ts"] >= since) and (until is None or entry["ts"] < until)
+            ][:limit]
+        
+        self.flush()
+        clauses, params = [], []
+        for clause, value in (("id < ?", before), ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        
+        db = sqlite3.connect(self.path, timeout=5)
+        try:
+            rows = db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM history {where}ORDER BY id DESC LIMIT ?",
+                              params + [limit]).fetchall()
+        finally:
+            db.close()
+        return [self._entry(row) for row in rows]
 
 # ============================================================
 # FLASK APP
@@ -345,14 +2446,150 @@ CORS(app, resources={
     r"/static/*": {"origins": "*"}  # Allow all origins for static files
 })
 
-# Initialize components
-print("=" * 60)
-print("🤖 Initializing Voice Controlled Robot System...")
-print("=" * 60)
+# ============================================================
+# WARM-UP - Background component loading and readiness
+# ============================================================
+class WarmUp:
+    """
+    Loads each component in its own background thread so the server
+    can accept connections immediately, and records per-component
+    state and load time for /ready.
+    """
+    
+    def __init__(self, loaders: Dict[str, callable]):
+        self.loaders = loaders
+        self.components = {
+            name: {"state": "pending", "seconds": None, "error": None}
+            for name in loaders
+        }
+        self.done = threading.Event()
+        self.loaded = {name: threading.Event() for name in loaders}  # Set once ready or failed
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start loading (idempotent)"""
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.monotonic()
+        
+        for name in self.loaders:
+            threading.Thread(target=self._load, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    def _load(self, name: str):
+        component = self.components[name]
+        component["state"] = "loading"
+        start = time.perf_counter()
+        try:
+            self.loaders[name]()
+            component["state"] = "ready"
+        except Exception as e:
+            component["state"] = "failed"
+            component["error"] = str(e)
+            log.exception("❌ Failed to load %s: %s", name, e)
+        finally:
+            component["seconds"] = round(time.perf_counter() - start, 3)
+            self.loaded[name].set()
+            with self._lock:
+                if all(c["state"] in ("ready", "failed") for c in self.components.values()):
+                    log.info("✅ Warm-up finished in %.1fs", time.monotonic() - self.started_at)
+                    self.done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_for(self.components)
+
+    def ready_for(self, names) -> bool:
+        return all(self.components[name]["state"] == "ready" for name in names)
+
+    def wait(self, timeout: float = None, names=None) -> bool:
+        """Block until the named components (default: all) finish loading or timeout; True if they're ready"""
+        self.start()
+        if names is None:
+            self.done.wait(timeout)
+            return self.ready
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self.loaded[name].wait(remaining)
+        return self.ready_for(names)
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: dict(c) for name, c in self.components.items()}
+
+# Components are created by the warm-up threads
+robot: Optional[RobotPool] = None
+stt = None  # SpeechToText, or InferencePool when STT_WORKERS > 0
+transcriber: Optional[TranscriptionBatcher] = None
+ai: Optional[VoiceAI] = None
+telemetry_poller: Optional[TelemetryPoller] = None
+
+def _load_robot():
+    global robot, telemetry_poller
+    from ml_ai import MLRobotAI
+    
+    # Group commands go to every attached robot
+    group_map = MLRobotAI().command_map
+    robot = RobotPool.from_config(broadcast_commands=[
+        group_map["all_lights_on"],
+        group_map["all_lights_off"],
+    ], on_change=_publish_connection)
+    _publish_connection()
+    
+    if Config.TELEMETRY_INTERVAL > 0:
+        telemetry_poller = TelemetryPoller(robot, Config.TELEMETRY_INTERVAL, Config.TELEMETRY_FILE)
+        telemetry_poller.start()
+
+def _load_stt():
+    global stt, transcriber
+    if Config.STT_WORKERS > 0:
+        # Each worker loads the model and does its own dummy pass
+        engine = InferencePool(Config.STT_WORKERS)
+    else:
+        engine = SpeechToText()
+        # Dummy pass so the first real request doesn't pay for allocation
+        engine.transcribe_batch([(np.zeros(Config.STREAM_SAMPLE_RATE, dtype=np.float32), Config.STREAM_SAMPLE_RATE)])
+    stt = engine
+    transcriber = TranscriptionBatcher(engine, concurrency=Config.STT_WORKERS)
+
+def _load_ai():
+    global ai
+    voice_ai = VoiceAI(use_ml_model=True)  # Use ML model from ml_ai.py
+    if voice_ai.ml_ai:
+        voice_ai.ml_ai.predict("maju")
+    ai = voice_ai
+
+def _load_history():
+    command_history.start()
 
-robot = RobotController(port=Config.SERIAL_PORT, baud_rate=Config.BAUD_RATE)
-stt = SpeechToText()
-ai = VoiceAI(use_ml_model=True)  # Use ML model from ml_ai.py
+warm_up = WarmUp({
+    "robot": _load_robot,
+    "stt": _load_stt,
+    "ai": _load_ai,
+    "history": _load_history,
+})
+
+def requires_ready(*components: str):
+    """
+    Hold requests briefly while the named components (default: all)
+    warm up, then answer 503. Routes that don't transcribe leave out
+    "stt", so typed text works while Whisper loads (or if it failed).
+    """
+    names = components or None
+    
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not warm_up.wait(Config.READY_WAIT_TIMEOUT, names):
+                return jsonify({
+                    "status": "starting",
+                    "message": "System is still loading, try again shortly",
+                    "components": warm_up.snapshot()
+                }), 503, {"Retry-After": "5"}
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
 
 # Global variables
 last_result = {
@@ -363,113 +2600,524 @@ last_result = {
     "timestamp": ""
 }
 
-command_history = []
+command_history = CommandHistory(Config.HISTORY_DB, Config.HISTORY_RING_SIZE)
 
 # ============================================================
 # ROUTES
 # ============================================================
 
+@app.before_request
+def _start_warm_up():
+    """Begin loading on first request when not started from __main__"""
+    warm_up.start()
+
+@app.before_request
+def _assign_request_id():
+    """Tag log lines with the caller's X-Request-ID, or a fresh one"""
+    rid = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex[:12]
+    request_id_var.set(rid)
+
+@app.after_request
+def _echo_request_id(response):
+    response.headers['X-Request-ID'] = request_id_var.get()
+    return response
+
+@app.route('/health')
+def health():
+    """Liveness: the process is up and serving"""
+    return jsonify({"status": "ok"})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route('/ready')
+def ready():
+    """Readiness: every component loaded"""
+    is_ready = warm_up.ready
+    return jsonify({
+        "status": "ready" if is_ready else "starting",
+        "components": warm_up.snapshot()
+    }), 200 if is_ready else 503
+
 @app.route('/')
 def index():
     """Serve the main page"""
     return render_template('index.html')
 
+def _execute_text(text: str, robot_id: Optional[str] = None) -> dict:
+    """Run a transcript through the AI and robot, and record the result"""
+    global last_result
+    
+    if not text:
+        last_result = {
+            "status": "error",
+            "text": "",
+            "command": "",
+            "response": "Tidak dapat mengenali suara",
+            "timestamp": datetime.now().strftime("%H:%M:%S")
+        }
+        # Not a command, so not in history; "result" events are history entries
+        events.publish("unrecognized", last_result)
+        return last_result
+    
+    # Step 2: Process command
+    with metrics.span("intent_classification"):
+        command = ai.process_command(text)
+    
+    return _execute_command(text, command, robot_id)
+
+def _execute_command(text: str, command: Optional[str], robot_id: Optional[str] = None) -> dict:
+    """Send an already-classified command to the robot, and record the result"""
+    global last_result
+    
+    # Step 3: Send to robot
+    if command:
+        response = robot.send_command(command, robot_id)
+        status = "success"
+    else:
+        response = "Perintah tidak dikenali"
+        status = "error"
+        command = ""
+    
+    # Step 4: Store result
+    last_result = {
+        "status": status,
+        "text": text,
+        "command": command,
+        "response": response,
+        "robot_id": robot_id or "",
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    }
+    
+    # Add to history (last_result gains its id and ts)
+    last_result = command_history.append(last_result)
+    
+    log.info("✅ Result: %s", last_result)
+    events.publish("result", last_result)
+    return last_result
+
+def _wants_timings() -> bool:
+    return Config.INCLUDE_TIMINGS or request.args.get('timings') == '1'
+
 @app.route('/api/process_audio', methods=['POST'])
+@requires_ready()
 def process_audio():
     """Process audio data from the client"""
-    global last_result
+    with metrics.request("process_audio") as timings:
+        response = _process_audio()
+        if _wants_timings() and isinstance(response, dict):
+            response["timings_ms"] = timings
     
+    if isinstance(response, dict):
+        return jsonify(response)
+    return response
+
+def _process_audio():
     if 'audio' not in request.files:
         return jsonify({"error": "No audio file provided"}), 400
     
     audio_file = request.files['audio']
-    audio_bytes = audio_file.read()
+    with metrics.span("upload_read"):
+        audio_bytes = audio_file.read()
     
     if not audio_bytes:
         return jsonify({"error": "Empty audio file"}), 400
     
+    robot_id = request.form.get('robot_id') or None
+    if robot_id and not robot.has(robot_id):
+        return jsonify({"error": f"Unknown robot: {robot_id}"}), 400
+    
     try:
-        # Step 1: Transcribe audio
-        print("\n" + "="*50)
-        print("🎤 Processing new audio...")
-        text = stt.process_audio(audio_bytes)
-        
-        if not text:
-            last_result = {
+        # Step 1a: Decode audio (rejects unusable uploads before any model work)
+        log.debug("🎤 Processing new audio...")
+        with metrics.span("audio_decode"):
+            clip = decode_upload(audio_bytes, audio_file.mimetype)
+        if clip is None:
+            return jsonify({
                 "status": "error",
-                "text": "",
-                "command": "",
-                "response": "Tidak dapat mengenali suara",
-                "timestamp": datetime.now().strftime("%H:%M:%S")
-            }
-            return jsonify(last_result)
+                "error": "Unsupported or undecodable audio (send WAV, WebM/Opus, OGG, FLAC or MP3)"
+            }), 415
         
-        # Step 2: Process command
-        command = ai.process_command(text)
-        
-        # Step 3: Send to robot
-        if command:
-            response = robot.send_command(command)
-            status = "success"
-        else:
-            response = "Perintah tidak dikenali"
-            status = "error"
-            command = ""
+        # Step 1b: Transcribe audio
+        text, stats = transcriber.transcribe_clip(*clip)
         
-        # Step 4: Store result
-        last_result = {
-            "status": status,
-            "text": text,
-            "command": command,
-            "response": response,
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        }
+        result = _execute_text(text, robot_id)
         
-        # Add to history
-        command_history.append(last_result.copy())
-        if len(command_history) > Config.MAX_HISTORY:
-            command_history.pop(0)
+        response = dict(result, decode=stats)
+        if _wants_timings() and stats:
+            # Batched stages ran on the batcher thread; take them from the stats
+            response["batch_timings_ms"] = {
+                "feature_extraction": stats["feature_ms"],
+                "whisper_generate": stats["decode_ms"],
+            }
+        return response
         
-        print(f"✅ Result: {last_result}")
-        print("="*50 + "\n")
+    except TranscriptionQueueFull:
+        raise
+    except Exception as e:
+        error_msg = f"Error processing audio: {str(e)}"
+        log.exception("❌ %s", error_msg)
+        return jsonify({"status": "error", "message": error_msg}), 500
+
+def _text_commands(texts) -> Tuple[Optional[List[str]], Optional[str]]:
+    """Validated, stripped texts, or an error message"""
+    if not isinstance(texts, list) or not texts:
+        return None, "Expected a non-empty list of texts"
+    if len(texts) > Config.MAX_TEXT_BATCH:
+        return None, f"At most {Config.MAX_TEXT_BATCH} texts per request"
+    if not all(isinstance(text, str) and text.strip() for text in texts):
+        return None, "Every text must be a non-empty string"
+    if any(len(text) > Config.MAX_TEXT_LENGTH for text in texts):
+        return None, f"Texts are limited to {Config.MAX_TEXT_LENGTH} characters"
+    return [text.strip() for text in texts], None
+
+@app.route('/api/process_text', methods=['POST'])
+@requires_ready("ai", "robot", "history")
+def process_text():
+    """Run a typed command (e.g. a suggestion chip) without speech recognition"""
+    data = request.get_json(silent=True) or {}
+    texts, error = _text_commands([data.get('text')])
+    if error:
+        return jsonify({"error": error}), 400
+    
+    robot_id = data.get('robot_id') or None
+    if robot_id and not robot.has(robot_id):
+        return jsonify({"error": f"Unknown robot: {robot_id}"}), 400
+    
+    with metrics.request("process_text") as timings:
+        response = dict(_execute_text(texts[0], robot_id))
+        if _wants_timings():
+            response["timings_ms"] = timings
+    return jsonify(response)
+
+@app.route('/api/process_text_batch', methods=['POST'])
+@requires_ready("ai", "robot", "history")
+def process_text_batch():
+    """Run {"texts": [...]} in order; intents are classified in one pass"""
+    data = request.get_json(silent=True) or {}
+    texts, error = _text_commands(data.get('texts'))
+    if error:
+        return jsonify({"error": error}), 400
+    
+    robot_id = data.get('robot_id') or None
+    if robot_id and not robot.has(robot_id):
+        return jsonify({"error": f"Unknown robot: {robot_id}"}), 400
+    
+    with metrics.request("process_text_batch") as timings:
+        with metrics.span("intent_classification"):
+            commands = ai.process_commands(texts)
+        # Sent one after another, so the robot sees them in request order
+        results = [_execute_command(text, command, robot_id) for text, command in zip(texts, commands)]
+        response = {"status": "ok", "results": results}
+        if _wants_timings():
+            response["timings_ms"] = timings
+    return jsonify(response)
+
+@app.route('/api/stream/start', methods=['POST'])
+@requires_ready()
+def stream_start():
+    """Open a streaming session for chunked PCM upload"""
+    _start_stream_reaper()
+    robot_id = (request.get_json(silent=True) or {}).get('robot_id')
+    if robot_id and not robot.has(robot_id):
+        return jsonify({"error": f"Unknown robot: {robot_id}"}), 400
+    
+    session = StreamSession(robot_id=robot_id)
+    with stream_sessions_lock:
+        stream_sessions[session.id] = session
+    
+    return jsonify({
+        "status": "ok",
+        "session_id": session.id,
+        "sample_rate": session.vad.sample_rate,
+        "format": "pcm_s16le"
+    })
+
+def _stream_results(session: StreamSession) -> list:
+    """
+    Transcribe and execute the session's finished utterances, in order.
+    If the transcription queue is full the rest stay pending (and the
+    results so far are kept) for the next call; call with session.lock held.
+    """
+    while session.pending:
+        utterance = session.pending[0]
+        log.debug("🎤 Utterance detected (%.2fs)", len(utterance) / session.vad.sample_rate)
+        text, stats = transcriber.transcribe_clip(utterance, session.vad.sample_rate)
+        session.pending.pop(0)
+        session.results.append(dict(_execute_text(text, session.robot_id), decode=stats))
+    
+    results, session.results = session.results, []
+    return results
+
+@app.route('/api/stream/<session_id>/chunk', methods=['POST'])
+@requires_ready()
+def stream_chunk(session_id):
+    """Feed raw 16-bit PCM; returns results for utterances that ended"""
+    with stream_sessions_lock:
+        session = stream_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown stream session"}), 404
+    
+    if (request.content_length or 0) > Config.STREAM_CHUNK_MAX:
+        return jsonify({"error": f"Chunk larger than {Config.STREAM_CHUNK_MAX} bytes"}), 413
+    data = request.get_data(cache=False)
+    if len(data) > Config.STREAM_CHUNK_MAX:
+        return jsonify({"error": f"Chunk larger than {Config.STREAM_CHUNK_MAX} bytes"}), 413
+    if len(data) % 2:
+        return jsonify({"error": "PCM chunk must contain whole 16-bit samples"}), 400
+    
+    try:
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        with session.lock:
+            session.last_seen = time.monotonic()
+            session.received += len(data)
+            if session.received > Config.MAX_AUDIO_SIZE:
+                with stream_sessions_lock:
+                    stream_sessions.pop(session_id, None)
+                return jsonify({"error": f"Stream exceeded {Config.MAX_AUDIO_SIZE} bytes, start a new one"}), 413
+            
+            # Queued before transcribing, so a full queue (429) doesn't lose them
+            session.pending.extend(session.vad.feed(samples))
+            results = _stream_results(session)
+            speaking = session.vad.in_speech
         
-        return jsonify(last_result)
+        return jsonify({"status": "ok", "speaking": speaking, "results": results})
         
+    except TranscriptionQueueFull:
+        raise
     except Exception as e:
-        error_msg = f"Error processing audio: {str(e)}"
-        print(f"❌ {error_msg}")
-        traceback.print_exc()
+        error_msg = f"Error processing stream: {str(e)}"
+        log.exception("❌ %s", error_msg)
         return jsonify({"status": "error", "message": error_msg}), 500
 
+@app.route('/api/stream/<session_id>/end', methods=['POST'])
+@requires_ready()
+def stream_end(session_id):
+    """Close a stream, transcribing any utterance still in progress"""
+    with stream_sessions_lock:
+        session = stream_sessions.pop(session_id, None)
+    if session is None:
+        return jsonify({"error": "Unknown stream session"}), 404
+    
+    with session.lock:
+        utterance = session.vad.flush()
+        if utterance is not None:
+            session.pending.append(utterance)
+        try:
+            results = _stream_results(session)
+        except TranscriptionQueueFull:
+            # Keep the session so the client can retry /end
+            session.last_seen = time.monotonic()
+            with stream_sessions_lock:
+                stream_sessions[session_id] = session
+            raise
+    
+    return jsonify({"status": "ok", "speaking": False, "results": results})
+
+@app.route('/api/feedback', methods=['POST'])
+@requires_ready()
+def feedback():
+    """Confirm what utterances meant: {"text", "label"} or {"items": [...]}"""
+    data = request.get_json(silent=True) or {}
+    items = data.get('items', [data])
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Expected {text, label} or {items: [{text, label}, ...]}"}), 400
+    
+    pairs = [(str(item.get('text') or ''), str(item.get('label') or '')) for item in items]
+    if not all(text.strip() and label for text, label in pairs):
+        return jsonify({"error": "Every item needs a text and a label"}), 400
+    
+    try:
+        learned = ai.learn(pairs)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({"status": "ok", "learned": learned, "total_learned": ai.ml_ai.learned})
+
 @app.route('/api/status')
 def get_status():
     """Get system status"""
+    if robot is None:
+        return jsonify({
+            "status": "starting",
+            "is_connected": False,
+            "port": None,
+            "robots": [],
+            "last_command": last_result,
+            "model": Config.WHISPER_MODEL,
+            "ml_cache": None,
+            "event_clients": events.clients,
+            "components": warm_up.snapshot(),
+            "error": None
+        })
+    
     return jsonify({
-        "status": "ok",
+        "status": "ok" if warm_up.ready else "starting",
         "is_connected": robot.connected,
         "port": robot.port,
+        "robots": robot.status(),
         "last_command": last_result,
         "model": Config.WHISPER_MODEL,
+        "ml_cache": ai.ml_ai.cache_stats() if ai and ai.ml_ai else None,
+        "event_clients": events.clients,
+        "components": warm_up.snapshot(),
         "error": robot.error
     })
 
+def _query_time(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds, or an ISO 8601 time (local time if no offset)"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
 @app.route('/api/history')
 def get_history():
-    """Get command history"""
+    """
+    Command history, newest first. Optional: limit, before (an id, for
+    paging) and since/until (epoch seconds or ISO 8601).
+    """
+    try:
+        limit = min(int(request.args.get('limit', Config.MAX_HISTORY)), Config.HISTORY_PAGE_MAX)
+        before = request.args.get('before')
+        before = int(before) if before is not None else None
+        since = _query_time(request.args.get('since'))
+        until = _query_time(request.args.get('until'))
+    except ValueError as e:
+        return jsonify({"error": f"Bad history query: {e}"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1"}), 400
+    
+    entries = command_history.query(limit, before, since, until)
     return jsonify({
         "status": "ok",
-        "history": list(reversed(command_history[-Config.MAX_HISTORY:]))
+        "history": entries,
+        # Pass as ?before= for the next (older) page
+        "next_before": entries[-1]["id"] if len(entries) == limit else None
     })
 
-@app.route('/api/check-connection')
-def check_connection():
-    """Check Arduino connection"""
-    return jsonify({
+def _connection_state() -> dict:
+    if robot is None:
+        return {
+            "connected": False,
+            "port": None,
+            "message": "Connecting to Arduino...",
+            "error": None
+        }
+    
+    return {
         "connected": robot.connected,
         "port": robot.port,
         "message": f"Arduino connected on {robot.port}" if robot.connected 
                   else "Arduino not connected - Running in simulation mode",
         "error": robot.error
+    }
+
+def _publish_connection():
+    events.publish("connection", _connection_state())
+
+@app.route('/api/telemetry')
+def get_telemetry():
+    """
+    Sensor time series. Optional: robot_id, metric (temperature or
+    humidity), since/until (epoch seconds or ISO 8601, default: the last
+    hour), resolution (auto, raw, 1m, 1h) and max_points.
+    """
+    if robot is None:
+        return jsonify({"status": "starting", "latest": {}, "series": {}})
+    
+    controller = robot.get(request.args.get('robot_id'))
+    if controller is None:
+        return jsonify({"error": f"Unknown robot: {request.args.get('robot_id')}"}), 400
+    
+    metrics_known = [metric for metric, _ in SensorTelemetry.COMMANDS.values()]
+    metric = request.args.get('metric')
+    if metric is not None and metric not in metrics_known:
+        return jsonify({"error": f"metric must be one of {', '.join(metrics_known)}"}), 400
+    resolution = request.args.get('resolution', 'auto')
+    if resolution != 'auto' and resolution not in SensorTelemetry.RESOLUTIONS:
+        return jsonify({"error": f"resolution must be auto or one of {', '.join(SensorTelemetry.RESOLUTIONS)}"}), 400
+    
+    try:
+        now = time.time()
+        until = _query_time(request.args.get('until')) or now
+        since = _query_time(request.args.get('since'))
+        since = until - 3600 if since is None else since
+        max_points = min(int(request.args.get('max_points', 500)), 5000)
+    except ValueError as e:
+        return jsonify({"error": f"Bad telemetry query: {e}"}), 400
+    
+    telemetry = controller.telemetry
+    series = {}
+    for name in [metric] if metric else metrics_known:
+        used, points = telemetry.query(name, since, until, resolution, max(1, max_points))
+        series[name] = {"resolution": used, "points": points}
+    
+    return jsonify({
+        "status": "ok",
+        "interval": Config.TELEMETRY_INTERVAL,
+        "latest": {
+            name: {"ts": ts, "value": value, "age": round(now - ts, 1)}
+            for name, (ts, value) in telemetry.latest.items()
+        },
+        # Points: [ts, value, min, max]; value is the bucket mean
+        "series": series,
+    })
+
+@app.route('/api/check-connection')
+def check_connection():
+    """Check Arduino connection"""
+    return jsonify(_connection_state())
+
+@app.route('/api/events')
+def event_stream():
+    """
+    Server-sent events: a "snapshot" (connection, last result, history)
+    on connect, then "result", "unrecognized" and "connection" events
+    as they happen
+    """
+    if events.full:
+        return jsonify({"error": "Too many event streams, poll instead"}), 503, {"Retry-After": "30"}
+    
+    def stream():
+        # Subscribed only once the server starts sending, so a client
+        # that is gone before then never holds a slot
+        subscriber = events.subscribe()
+        if subscriber is None:
+            # Lost the race for the last slot; the browser retries later
+            yield b"retry: 30000\n\n"  # Same back-off as the 503 Retry-After
+            return
+        try:
+            # Read the sequence number after subscribing: an event racing
+            # the snapshot is delivered twice (clients skip it by id) rather than lost
+            snapshot = events.format("snapshot", {
+                "seq": events.seq,
+                "connection": _connection_state(),
+                "last_result": last_result,
+                "history": command_history.recent(Config.MAX_HISTORY),
+            })
+            yield f"retry: {Config.SSE_RETRY_MS}\n\n".encode() + snapshot
+            while True:
+                try:
+                    chunk = subscriber.get(timeout=Config.SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+                    continue
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            events.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Don't let nginx hold events back
     })
 
 @app.route('/static/<path:path>')
@@ -486,6 +3134,14 @@ def not_found(e):
     """Handle 404 errors"""
     return jsonify({"error": "Not found"}), 404
 
+@app.errorhandler(TranscriptionQueueFull)
+def transcription_busy(e):
+    """Shed load instead of queueing without bound"""
+    return jsonify({
+        "status": "busy",
+        "error": "Speech recognition is at capacity, try again shortly"
+    }), 429, {"Retry-After": str(e.retry_after)}
+
 @app.errorhandler(500)
 def server_error(e):
     """Handle 500 errors"""
@@ -495,13 +3151,30 @@ def server_error(e):
 # CLEANUP
 # ============================================================
 
+_cleaned_up = threading.Event()
+
 def cleanup():
-    """Cleanup resources on shutdown"""
-    print("\n🛑 Shutting down...")
-    robot.disconnect()
-    print("✅ Cleanup complete")
+    """Cleanup resources on shutdown (safe to call more than once)"""
+    if _cleaned_up.is_set():
+        return
+    _cleaned_up.set()
+    log.info("🛑 Shutting down...")
+    events.close()
+    _stream_reaper_stop.set()
+    if transcriber:
+        transcriber.close()
+    if isinstance(stt, InferencePool):
+        stt.close()
+    if telemetry_poller:
+        telemetry_poller.stop()
+    if ai and ai.ml_ai and ai.ml_ai.online:
+        ai.ml_ai.flush_save()
+    if robot:
+        robot.disconnect()
+    command_history.close()
+    log.info("✅ Cleanup complete")
+    log_listener.stop()
 
-import atexit
 atexit.register(cleanup)
 
 # ============================================================
@@ -515,12 +3188,17 @@ if __name__ == '__main__':
     os.makedirs('static/css', exist_ok=True)
     os.makedirs('static/js', exist_ok=True)
     
-    print("\n" + "="*60)
-    print("🌐 Starting web server...")
-    print(f"📡 Access: http://localhost:{Config.PORT}")
-    print(f"🔌 Arduino: {'Connected' if robot.connected else 'Simulation Mode'}")
-    print(f"🧠 Model: {Config.WHISPER_MODEL}")
-    print("="*60 + "\n")
+    log.info("🤖 Initializing Voice Controlled Robot System...")
+    
+    # With the debug reloader only the child process serves requests,
+    # so don't load models in the watcher process as well
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up.start()
+    
+    log.info("🌐 Starting web server...")
+    log.info("📡 Access: http://localhost:%s", Config.PORT)
+    log.info("🔌 Arduino: connecting in background (see /ready)")
+    log.info("🧠 Model: %s", Config.WHISPER_MODEL)
     
     # Start server
     try:
@@ -531,5 +3209,5 @@ if __name__ == '__main__':
             threaded=True
         )
     except KeyboardInterrupt:
-        print("\n👋 Goodbye!")
+        log.info("👋 Goodbye!")
         cleanup()
\ No newline at end of file